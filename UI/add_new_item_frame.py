@@ -11,7 +11,7 @@ from UI.utilities import prepare_dropdown_options_lists
 class AddNewItemFrame(customtkinter.CTkFrame):
     """A frame for adding new products/components"""
 
-    def __init__(self, master, presenter, tab_view):
+    def __init__(self, master, presenter):
         super().__init__(master)
 
         self.manage_component_window = None
@@ -19,7 +19,6 @@ class AddNewItemFrame(customtkinter.CTkFrame):
         # widgets which should not be greyed out when adding a component
         self.component_compatible_widgets = []
         self.presenter = presenter
-        self.tab_view = tab_view
         # needed to make widgets display in centre of screen
         self.centre_frame = customtkinter.CTkFrame(self)
         self.centre_frame.grid(row=0, column=0)
@@ -169,6 +168,32 @@ class AddNewItemFrame(customtkinter.CTkFrame):
             [self.design_options, self.colour_options, self.type_options]
         )
 
+    def refresh_menu_options(self):
+        """
+        Updates the options of the comboboxes/optionmenus, e.g. after a product with a
+        new colour has been added or deleted
+        """
+        self.load_menu_options_values()
+        self.design_dropdown.configure(values=self.design_options)
+        self.colour_dropdown.configure(values=self.colour_options)
+        self.type_dropdown.configure(values=self.type_options)
+
+    def reset_component_window(self):
+        """
+        Closes the component selection window so that a new one, with the current
+        components and no selected quantities, is created when it is next opened
+        """
+        if self.manage_component_window:
+            self.manage_component_window.destroy()
+            self.manage_component_window = None
+
+    def clear_inputs(self):
+        """Clears the item's details after it has been added, ready for the next item"""
+        self.name_entry.delete(0, "end")
+        self.stock_spinbox.set(0)
+        self.low_stock_spinbox.set(0)
+        self.reset_component_window()
+
     def on_add_button_click(
         self,
         option_menu_to_update,
@@ -289,9 +314,6 @@ class AddNewItemFrame(customtkinter.CTkFrame):
                 self.create_name_error_popup()
                 return
 
-        #reloads UI elements that need updating after new item has been added
-        self.tab_view.reload_all_frames()
-
         MessageBox(f"{item_type} Added", f"Successfully added the new {item_type.lower()}!")
 
     def create_name_error_popup(self):
@@ -7,7 +7,7 @@ from UI.messagebox import MessageBox
 class AdjustStockLevelPopup(SmallPopup):
     """A popup window to adjust the stock level of a given item"""
 
-    def __init__(self, item_name, item_id, item_type, presenter, tab_view):
+    def __init__(self, item_name, item_id, item_type, presenter):
         super().__init__()
         self.title("Adjust Stock Level")
         self.geometry("500x250")
@@ -16,7 +16,6 @@ class AdjustStockLevelPopup(SmallPopup):
         self.item_id = item_id
         self.item_type = item_type
         self.presenter = presenter
-        self.tab_view = tab_view
 
         #keep widgets in centre during resizing
         self.grid_rowconfigure(0, weight=1)
@@ -68,11 +67,8 @@ class AdjustStockLevelPopup(SmallPopup):
             # increase stock
             if self.item_type == "Product":
                 self.presenter.update_product_stock_level(self.item_id, stock_level_change)
-                self.tab_view.reload_all_frames() # reloads UI to show new values
             elif self.item_type == "Component":
                 self.presenter.update_component_stock_level(self.item_id, stock_level_change)
-                # reloads UI to show new values
-                self.tab_view.reload_all_frames(display_components_in_view_items_frame=True)
 
             self.show_confirm_messagebox(self.item_type)
         elif stock_level_change < 0:
@@ -84,14 +80,11 @@ class AdjustStockLevelPopup(SmallPopup):
                     self.item_type,
                     stock_level_change,
                     self.presenter,
-                    self.tab_view,
                     self.show_confirm_messagebox
                 )
             elif self.item_type == "Component":
                 # increase stock
                 self.presenter.update_component_stock_level(self.item_id, stock_level_change)
-                # reloads UI to show new values
-                self.tab_view.reload_all_frames(display_components_in_view_items_frame=True)
                 self.show_confirm_messagebox(self.item_type)
 
         # if stock_level_change == 0 then do nothing other than close the window
@@ -121,7 +114,6 @@ class ReduceComponentStockLevelPopup(SmallPopup):
         item_type,
         stock_level_change,
         presenter,
-        tab_view,
         confirm_delete_popup_func
     ):
         super().__init__()
@@ -132,7 +124,6 @@ class ReduceComponentStockLevelPopup(SmallPopup):
         self.item_type = item_type
         self.stock_level_change = stock_level_change
         self.presenter = presenter
-        self.tab_view = tab_view
         self.confirm_delete_popup_func =  confirm_delete_popup_func
 
         # widgets
@@ -169,7 +160,7 @@ class ReduceComponentStockLevelPopup(SmallPopup):
 
     def on_no_button_click(self):
         """
-        Update just the product's stock level, then close the pop-up and reload the UI
+        Update just the product's stock level, then close the pop-up
         """
         if self.item_type == "Product":
             self.presenter.update_product_stock_level(
@@ -180,17 +171,15 @@ class ReduceComponentStockLevelPopup(SmallPopup):
                 self.item_id, self.stock_level_change
             )
         self.release_focus_and_hide()
-        self.tab_view.reload_all_frames() # reloads UI to show new values
         self.confirm_delete_popup_func(self.item_type)
 
     def on_yes_button_click(self):
         """
         Update the product's stock level, as well as its components' stock levels, then
-        close the pop-up and reload the UI
+        close the pop-up
         """
         self.presenter.update_product_stock_level_and_its_components_stock_levels(
             self.item_id, self.stock_level_change
         )
         self.release_focus_and_hide()
-        self.tab_view.reload_all_frames() # reloads UI to show new values
         self.confirm_delete_popup_func(self.item_type)
@@ -3,6 +3,21 @@
 WIDGET_X_PADDING = 10
 WIDGET_Y_PADDING = 10
 TABLE_SCROLL_SPEED = 1
+# how long a table can spend adding rows before letting the UI update (~1 frame)
+TABLE_BUILD_TIME_BUDGET_MS = 8
+# tables with more rows than this only create widgets for the rows that are visible
+VIRTUALISED_TABLE_MIN_NUM_ROWS = 100
+# the number of rows a virtualised table creates before its visible height is known
+VIRTUALISED_TABLE_INITIAL_NUM_ROWS = 30
+# how long to wait after the last key press in the name filter before filtering, so
+# that typing a name only runs one query
+FILTER_DEBOUNCE_MS = 150
+# how often to check whether a query running in the database thread has finished
+QUERY_POLL_MS = 10
+# items which are predicted to run out within this many days are shown in the low
+# stock tab, which works them out again this often (it reads every item's sales)
+PREDICTED_LOW_STOCK_DAYS = 14
+PREDICTED_LOW_STOCK_REFRESH_MS = 10 * 60 * 1000
 
 # colours
 TABLE_HEADER_COLOUR = "black"
@@ -1,8 +1,16 @@
 import customtkinter
+import time
 from tkinter import StringVar
 import tkinter.font as tkfont
 from UI import config
 
+def cell_text_to_string(cell_text):
+    """
+    Converts a value to the text to display in a cell - None is displayed as an empty
+    cell rather than 'None'
+    """
+    return "" if cell_text is None else str(cell_text)
+
 class CustomTable(customtkinter.CTkScrollableFrame):
     """Class to create a table widget"""
     SCROLL_UP = 0
@@ -20,7 +28,8 @@ class CustomTable(customtkinter.CTkScrollableFrame):
         header_colour=config.TABLE_HEADER_COLOUR,
         data_colour=config.TABLE_REGULAR_ROW_COLOUR,
         cell_hover_colour=config.TABLE_HOVER_COLOUR,
-        selected_row_colour = config.TABLE_SELECTED_ROW_COLOUR
+        selected_row_colour = config.TABLE_SELECTED_ROW_COLOUR,
+        on_build_progress_callback=None
     ):
         super().__init__(master)
 
@@ -38,6 +47,10 @@ class CustomTable(customtkinter.CTkScrollableFrame):
         self.selected_row_colour = selected_row_colour
         self.selected_row = None
         self.tooltip = None
+        # called as the rows are added to the table, see add_next_batch_of_rows()
+        self.on_build_progress_callback = on_build_progress_callback
+        self.next_row_to_add = 0
+        self.build_callback_id = None
 
         centre_frame = customtkinter.CTkFrame(self) # needed to centre the table horizontally
         centre_frame.grid(row=0, column=0)
@@ -49,75 +62,260 @@ class CustomTable(customtkinter.CTkScrollableFrame):
         # display table
         self.add_cells(centre_frame)
 
-        # bindings for scrolling, as mouse wheel scrolling doesn't work in linux
-        # see https://github.com/TomSchimansky/CustomTkinter/issues/1356
-        # children widgets also need binding so that mousewheel scrolling works when
-        # cursor is over the table widget itself (not just the frame)
+        self.bind_scroll_events(self)
+
+    def bind_scroll_events(self, widget):
+        """
+        Bindings for scrolling, as mouse wheel scrolling doesn't work in linux
+        see https://github.com/TomSchimansky/CustomTkinter/issues/1356
+        Children widgets also need binding so that mousewheel scrolling works when
+        cursor is over the table widget itself (not just the frame)
+        """
         self.bind_widget_and_children(
-            self, "<Button-4>", lambda e: self.scroll_table(self.SCROLL_UP)
+            widget, "<Button-4>", lambda e: self.scroll_table(self.SCROLL_UP)
         )
         self.bind_widget_and_children(
-            self, "<Button-5>", lambda e: self.scroll_table(self.SCROLL_DOWN)
+            widget, "<Button-5>", lambda e: self.scroll_table(self.SCROLL_DOWN)
         )
 
-    def add_cells(self, frame, row_num=0, col_num=0):
+    def add_cells(self, frame):
         """
-        This function recursively adds all the cell widgets to the table. It has to be
-        implemented like this rather than a standard loop as otherwise when loading a
-        non-small table, the main thread will become blocked (and the display frozen)
-        until the UI is completely loaded. The recursive call is scheduled to run after
-        a millisecond - this is what frees up the main thread so it remains responsive.
+        Starts adding the cell widgets to the table. Adding them all in a standard loop
+        would block the main thread (freezing the display) until a non-small table is
+        completely loaded, so the rows are added in batches instead - see
+        add_next_batch_of_rows()
         """
-        if col_num >= len(self.combined_data[row_num]):
-            col_num = 0
-            row_num += 1
+        self.table_frame = frame
+        # the cells and StringVars of each row in combined_data, or None if the row
+        # hasn't been added yet
+        self.row_widgets = [None] * len(self.combined_data)
+        self.add_next_batch_of_rows()
 
-        if row_num >= len(self.combined_data):
-            return
+    def add_next_batch_of_rows(self):
+        """
+        Adds rows to the table until either all the rows have been added or
+        config.TABLE_BUILD_TIME_BUDGET_MS has passed, in which case the next batch is
+        scheduled to run after a millisecond - this is what frees up the main thread so
+        it remains responsive. Calls on_build_progress_callback (if there is one) with
+        the number of rows added so far and the total number of rows.
+        """
+        time_limit = time.perf_counter() + config.TABLE_BUILD_TIME_BUDGET_MS / 1000
 
-        cell_text = self.combined_data[row_num][col_num]
-        cell_width = self.column_widths[col_num]
-        # a CTkEntry widget is used despite not needing text input functionality
-        # because it is easier to achieve the appearance of a table cell with a
-        # CTkEntry widget
-        cell = customtkinter.CTkEntry(
-            frame,
-            textvariable=StringVar(self, cell_text),
-            font=self.font,
-            state="disabled",
-            fg_color=self.data_colour,
-            width=cell_width
-        )
-        cell.grid(row=row_num, column=col_num)
+        while self.next_row_to_add < len(self.combined_data):
+            # rows kept by update_data() already have widgets
+            if self.row_widgets[self.next_row_to_add] is None:
+                self.row_widgets[self.next_row_to_add] = self.add_row(self.next_row_to_add)
+            self.next_row_to_add += 1
 
-        # header row
-        if row_num == 0:
-            cell.configure(fg_color=self.header_colour)
-        # data rows
+            if time.perf_counter() >= time_limit:
+                break
+
+        if self.on_build_progress_callback:
+            self.on_build_progress_callback(self.next_row_to_add, len(self.combined_data))
+
+        if self.next_row_to_add < len(self.combined_data):
+            self.build_callback_id = self.after(1, self.add_next_batch_of_rows)
         else:
-            # hover bindings
-            cell.bind("<Enter>", self.on_mouse_enter_cell)
-            cell.bind("<Leave>", self.on_mouse_leave_cell)
-            cell.bind("<Motion>", self.on_mouse_motion)
-            #click binding
-            cell.bind("<Button-1>", self.click_row)
+            self.build_callback_id = None
+
+    def add_row(self, row_num):
+        """
+        Adds the cell widgets for a row of the table, and returns a dictionary of the
+        row's cells and the StringVars holding their text
+        """
+        row_widgets = {"cells": [], "string_vars": [], "row_num": row_num}
+
+        for col_num, cell_text in enumerate(self.combined_data[row_num]):
+            cell_width = self.column_widths[col_num]
+            string_var = StringVar(self, cell_text_to_string(cell_text))
+            # a CTkEntry widget is used despite not needing text input functionality
+            # because it is easier to achieve the appearance of a table cell with a
+            # CTkEntry widget
+            cell = customtkinter.CTkEntry(
+                self.table_frame,
+                textvariable=string_var,
+                font=self.font,
+                state="disabled",
+                fg_color=self.data_colour,
+                width=cell_width
+            )
+            cell.grid(row=row_num, column=col_num)
+
+            # header row
+            if row_num == 0:
+                cell.configure(fg_color=self.header_colour)
+            # data rows
+            else:
+                # hover bindings
+                cell.bind("<Enter>", self.on_mouse_enter_cell)
+                cell.bind("<Leave>", self.on_mouse_leave_cell)
+                cell.bind("<Motion>", self.on_mouse_motion)
+                #click binding
+                cell.bind("<Button-1>", self.click_row)
+
+            self.bind_scroll_events(cell)
+            row_widgets["cells"].append(cell)
+            row_widgets["string_vars"].append(string_var)
+
+        return row_widgets
+
+    def update_data(self, new_data):
+        """
+        Displays new data in the table without rebuilding it. Rows are matched to the
+        existing rows by their first column (the item's ID): matching rows keep their
+        widgets and only have their changed cells updated, rows which are no longer in
+        the data are removed, and new rows are added. The selected row stays selected
+        if it's still in the data. Raises an exception if more than one row has the
+        same first column value, as the rows couldn't be matched up.
+        """
+        self.cancel_build()
+        self.check_is_data_correct_shape(new_data)
+        self.check_row_keys_are_unique(new_data)
+        selected_key = self.get_selected_row_key()
+
+        widgets_by_key = {
+            row[0]: row_widgets
+            for row, row_widgets in zip(self.data, self.row_widgets[1:])
+            if row_widgets is not None
+        }
+        new_row_widgets = [self.row_widgets[0]] # the header row doesn't change
+
+        for row_num, row in enumerate(new_data, start=1):
+            row_widgets = widgets_by_key.pop(row[0], None)
+
+            if row_widgets is not None:
+                for string_var, cell_text in zip(row_widgets["string_vars"], row):
+                    cell_string = cell_text_to_string(cell_text)
+                    if string_var.get() != cell_string:
+                        string_var.set(cell_string)
+
+                # move the row if rows before it have been added or removed
+                if row_widgets["row_num"] != row_num:
+                    for cell in row_widgets["cells"]:
+                        cell.grid(row=row_num)
+                    row_widgets["row_num"] = row_num
+
+            new_row_widgets.append(row_widgets)
+
+        # remove the rows which are no longer in the data
+        for row_widgets in widgets_by_key.values():
+            for cell in row_widgets["cells"]:
+                cell.destroy()
+
+        self.data = new_data
+        self.combined_data = [self.columns] + new_data
+        self.row_widgets = new_row_widgets
+        self.selected_row = self.find_row_num_from_key(selected_key)
+        self.resize_columns()
+
+        # add the widgets for the new rows
+        self.next_row_to_add = 0
+        self.add_next_batch_of_rows()
+
+    def can_display(self, data, columns):
+        """
+        Returns whether update_data() can be used to display the data, i.e. the columns
+        are the same and this is the right type of table for the amount of data
+        """
+        return (
+            list(columns) == list(self.columns)
+            and type(self) is get_table_class(data)
+        )
 
-        self.after(1, lambda: self.add_cells(frame, row_num, col_num+1))
+    def get_selected_row_key(self):
+        """Returns the first column value (the ID) of the selected row, if there is one"""
+        if self.selected_row is None:
+            return None
 
-    def check_is_data_correct_shape(self):
-        """Checks the data and the column headers are compatible shapes and consistent"""
-        if len(self.data) == 0:
+        return self.data[self.selected_row - 1][0] # -1 as the header counts as row 0
+
+    def find_row_num_from_key(self, key):
+        """
+        Returns the row number (counting the header as row 0) of the row with the given
+        first column value (the ID), or None if there isn't one
+        """
+        if key is None:
+            return None
+
+        for data_row_num, row in enumerate(self.data):
+            if row[0] == key:
+                return data_row_num + 1
+
+        return None
+
+    def resize_columns(self):
+        """
+        Recalculates the column widths for the current data, and resizes the cells if
+        any of the widths have changed
+        """
+        new_column_widths = self.calculate_column_widths(self.combined_data, self.font[1])
+
+        if new_column_widths == self.column_widths:
             return
 
-        num_cols_in_data = len(self.data[0])
+        self.column_widths = new_column_widths
+        for row_cells in self.get_all_row_cells():
+            for cell, cell_width in zip(row_cells, self.column_widths):
+                cell.configure(width=cell_width)
+
+    def get_all_row_cells(self):
+        """Returns a list of the cells of each row that has been added to the table"""
+        return [
+            row_widgets["cells"]
+            for row_widgets in self.row_widgets
+            if row_widgets is not None
+        ]
+
+    def cancel_build(self):
+        """Stops adding any more rows to the table"""
+        if self.build_callback_id is not None:
+            self.after_cancel(self.build_callback_id)
+            self.build_callback_id = None
+
+    def destroy(self):
+        """Stops adding rows before destroying the table"""
+        self.cancel_build()
+        super().destroy()
+
+    def remove(self):
+        """
+        Removes the table from the UI and destroys all of its widgets. destroy() isn't
+        enough on its own as CTkScrollableFrame.destroy() doesn't destroy the frame that
+        holds its canvas and scrollbar (this table is inside that frame so is destroyed
+        along with it).
+        """
+        self._parent_frame.destroy()
 
-        for row in self.data:
+    def check_is_data_correct_shape(self, data=None):
+        """
+        Checks the data and the column headers are compatible shapes and consistent. If
+        data isn't given, the table's current data is checked.
+        """
+        if data is None:
+            data = self.data
+
+        if len(data) == 0:
+            return
+
+        num_cols_in_data = len(data[0])
+
+        for row in data:
             if len(row) != num_cols_in_data:
                 raise Exception("Rows in data are different lengths")
 
         if len(self.columns) != num_cols_in_data:
             raise Exception("Number of column names is different to data")
 
+    def check_row_keys_are_unique(self, data):
+        """
+        Checks that no two rows have the same first column value (the key which
+        update_data() matches rows by)
+        """
+        row_keys = [row[0] for row in data]
+
+        if len(set(row_keys)) != len(row_keys):
+            raise Exception("Rows in data have the same first column value")
+
     def change_row_colour(self, row_num, grid_info, colour):
         """Sets the colour for all the cells in a row"""
         cells_in_row = grid_info["in"].grid_slaves(row=row_num)
@@ -255,3 +453,334 @@ class CustomTable(customtkinter.CTkScrollableFrame):
         # bind all the widget's children recursively
         for child in widget.winfo_children():
             self.bind_widget_and_children(child, event, func)
+
+
+class VirtualisedCustomTable(CustomTable):
+    """
+    A CustomTable which only creates widgets for the rows that can currently be seen,
+    rather than for every row. As the table is scrolled, the same row widgets are
+    reused to display whichever rows have scrolled into view, so the time taken to
+    display the table and the memory it uses depend on the height of the table rather
+    than the amount of data.
+    The table's frame is never taller than the visible area, as X11 can't display
+    widgets taller than 32767 pixels (a few thousand rows). Instead, the table keeps
+    track of which row is at the top and updates the scrollbar itself.
+    """
+    # the number of rows scrolled by each turn of the mouse wheel
+    ROWS_PER_SCROLL = 3
+
+    # the number of the longest (by number of characters) texts in each column which
+    # are measured to calculate the column widths
+    NUM_TEXTS_TO_MEASURE = 10
+
+    def calculate_column_widths(self, full_data, font_size, min_width=100, max_width=350):
+        """
+        Calculates the column widths in the same way as CustomTable, but only measures
+        the texts in each column with the most characters, as measuring every cell
+        would take longer than displaying the visible ones
+        """
+        num_columns = len(full_data[0])
+        # rows which only have text in one column, so each text is measured once
+        longest_texts_rows = []
+
+        for column_num in range(num_columns):
+            column_texts = sorted(
+                (str(row[column_num]) for row in full_data), key=len, reverse=True
+            )
+
+            for text in column_texts[:self.NUM_TEXTS_TO_MEASURE]:
+                row = [""] * num_columns
+                row[column_num] = text
+                longest_texts_rows.append(row)
+
+        return super().calculate_column_widths(
+            longest_texts_rows, font_size, min_width, max_width
+        )
+
+    def add_cells(self, frame):
+        """
+        Adds the header row and the initial pool of reusable row widgets, and takes
+        over the scrollbar so that scrolling changes which rows the pool displays
+        rather than moving the frame
+        """
+        self.table_frame = frame
+        # each pool row is a dict of the row's frame and the StringVars of its cells
+        self.row_pool = []
+        # the index in self.data of the row each pool row is displaying
+        self.pool_data_indexes = []
+        # the index in self.data of the row at the top of the table
+        self.first_data_index = 0
+
+        self.header_row = self.create_pool_row(is_header=True)
+        for string_var, column_name in zip(self.header_row["string_vars"], self.columns):
+            string_var.set(column_name)
+        self.header_row["frame"].place(x=0, y=0)
+
+        # measure a real row so the rows can be positioned without gaps
+        self.resize_table_frame()
+
+        # the frame is never taller than the canvas, so the canvas never scrolls and
+        # the scrollbar is set by update_scrollbar() instead
+        self._parent_canvas.configure(yscrollcommand="")
+        self._scrollbar.configure(command=self.on_scrollbar_move)
+        # redisplay the rows whenever the table is resized
+        self._parent_canvas.bind(
+            "<Configure>", lambda e: self.display_visible_rows(), add="+"
+        )
+
+        self.display_visible_rows(
+            min_num_rows=config.VIRTUALISED_TABLE_INITIAL_NUM_ROWS
+        )
+
+    def bind_scroll_events(self, widget):
+        """
+        Binds the Linux scroll events in the same way as CustomTable, and the mouse
+        wheel for Windows and macOS, as customtkinter's own handler scrolls the canvas
+        """
+        super().bind_scroll_events(widget)
+        self.bind_widget_and_children(
+            widget,
+            "<MouseWheel>",
+            lambda e: self.scroll_table(self.SCROLL_UP if e.delta > 0 else self.SCROLL_DOWN)
+        )
+
+    def resize_table_frame(self):
+        """
+        Measures the size of the header row, and sets the width of the table to fit
+        it. The height only fits the rows on screen - see display_visible_rows().
+        """
+        self.update_idletasks()
+        scaling = self._get_widget_scaling()
+        # place() and configure() scale their values, so the sizes are unscaled
+        self.row_height = self.header_row["frame"].winfo_reqheight() / scaling
+        table_width = self.header_row["frame"].winfo_reqwidth() / scaling
+
+        self.table_frame.configure(width=table_width)
+
+    def update_data(self, new_data):
+        """
+        Displays new data in the table. Only the visible rows have widgets, so they are
+        simply given the new data. The selected row stays selected if it's still in the
+        data (matched by its first column, the item's ID).
+        """
+        self.check_is_data_correct_shape(new_data)
+        self.check_row_keys_are_unique(new_data)
+        selected_key = self.get_selected_row_key()
+
+        self.data = new_data
+        self.combined_data = [self.columns] + new_data
+        self.selected_row = self.find_row_num_from_key(selected_key)
+        self.resize_columns()
+        self.resize_table_frame()
+
+        # makes every pool row take the new data
+        self.pool_data_indexes = [None] * len(self.row_pool)
+        self.display_visible_rows()
+
+    def get_all_row_cells(self):
+        """Returns a list of the cells of the header row and of each pool row"""
+        return [
+            pool_row["frame"].winfo_children()
+            for pool_row in [self.header_row] + self.row_pool
+        ]
+
+    def create_pool_row(self, is_header=False):
+        """Creates the widgets for a row, with a StringVar for each cell's text"""
+        row_frame = customtkinter.CTkFrame(
+            self.table_frame, fg_color="transparent", corner_radius=0
+        )
+        string_vars = []
+
+        for col_num, cell_width in enumerate(self.column_widths):
+            string_var = StringVar(self)
+            # a CTkEntry widget is used for the same reason as in CustomTable.add_row()
+            cell = customtkinter.CTkEntry(
+                row_frame,
+                textvariable=string_var,
+                font=self.font,
+                state="disabled",
+                fg_color=self.header_colour if is_header else self.data_colour,
+                width=cell_width
+            )
+            cell.grid(row=0, column=col_num)
+            string_vars.append(string_var)
+
+            if not is_header:
+                # hover bindings
+                cell.bind("<Enter>", self.on_mouse_enter_cell)
+                cell.bind("<Leave>", self.on_mouse_leave_cell)
+                cell.bind("<Motion>", self.on_mouse_motion)
+                #click binding
+                cell.bind("<Button-1>", self.click_row)
+
+        # lets the event handlers find which pool row a cell belongs to
+        row_frame.pool_index = None if is_header else len(self.row_pool)
+
+        return {"frame": row_frame, "string_vars": string_vars}
+
+    def scroll_table(self, scroll_direction):
+        """Scrolls the table by ROWS_PER_SCROLL rows in the given direction"""
+        num_rows = self.ROWS_PER_SCROLL * config.TABLE_SCROLL_SPEED
+        if scroll_direction == self.SCROLL_UP:
+            num_rows *= -1
+
+        self.scroll_to_row(self.first_data_index + num_rows)
+
+    def on_scrollbar_move(self, action, amount, unit=None):
+        """
+        Called when the scrollbar is dragged or clicked, with the same arguments that
+        the scrollbar would pass to the canvas's yview() - either ("moveto", fraction
+        of the way down) or ("scroll", number of units or pages, "units" or "pages")
+        """
+        if action == "moveto":
+            self.scroll_to_row(round(float(amount) * len(self.data)))
+        elif unit == "pages":
+            self.scroll_to_row(self.first_data_index + int(amount) * self.num_visible_rows)
+        else:
+            self.scroll_to_row(self.first_data_index + int(amount))
+
+    def scroll_to_row(self, data_index):
+        """Displays the rows starting from data_index at the top of the table"""
+        self.first_data_index = data_index
+        self.display_visible_rows()
+
+    def update_scrollbar(self):
+        """Sets the scrollbar to show which part of the data is on screen"""
+        if len(self.data) == 0:
+            self._scrollbar.set(0, 1)
+            return
+
+        self._scrollbar.set(
+            self.first_data_index / len(self.data),
+            (self.first_data_index + self.num_visible_rows) / len(self.data)
+        )
+
+    def display_visible_rows(self, min_num_rows=0):
+        """
+        Gives the pool rows the data of the rows that fit on screen, starting from
+        first_data_index, and makes the frame tall enough for just those rows. Pool
+        rows which are already showing the right data are left alone.
+        """
+        scaling = self._get_widget_scaling()
+        row_height_pixels = self.row_height * scaling
+        visible_height = self._parent_canvas.winfo_height()
+
+        # -1 as the header is the first row
+        num_rows = max(min_num_rows, int(visible_height / row_height_pixels) - 1, 1)
+        self.num_visible_rows = min(num_rows, len(self.data))
+        self.add_pool_rows(self.num_visible_rows)
+        self.table_frame.configure(height=self.row_height * (self.num_visible_rows + 1))
+
+        # stops the rows running past the end of the data
+        self.first_data_index = max(
+            0, min(self.first_data_index, len(self.data) - self.num_visible_rows)
+        )
+
+        for pool_index in range(len(self.row_pool)):
+            # there can be more pool rows than fit on screen after the table shrinks
+            if pool_index < self.num_visible_rows:
+                data_index = self.first_data_index + pool_index
+            else:
+                data_index = None
+
+            self.display_data_in_pool_row(pool_index, data_index)
+
+        self.update_scrollbar()
+
+    def add_pool_rows(self, num_rows):
+        """Creates more pool rows, if there are fewer than num_rows"""
+        while len(self.row_pool) < num_rows:
+            pool_row = self.create_pool_row()
+            self.row_pool.append(pool_row)
+            self.pool_data_indexes.append(None)
+            self.bind_scroll_events(pool_row["frame"])
+
+    def display_data_in_pool_row(self, pool_index, data_index):
+        """
+        Displays the data row at data_index using the given pool row, or hides the pool
+        row if data_index is None
+        """
+        if self.pool_data_indexes[pool_index] == data_index:
+            return
+
+        pool_row = self.row_pool[pool_index]
+        self.pool_data_indexes[pool_index] = data_index
+
+        if data_index is None:
+            pool_row["frame"].place_forget()
+            return
+
+        for string_var, cell_text in zip(pool_row["string_vars"], self.data[data_index]):
+            string_var.set(cell_text_to_string(cell_text))
+
+        self.change_pool_row_colour(pool_index, self.get_row_colour(data_index))
+        # each pool row always stays in the same place, +1 as the header is the first row
+        pool_row["frame"].place(x=0, y=self.row_height * (pool_index + 1))
+
+    def get_row_colour(self, data_index):
+        """Returns the colour a data row should be, depending on if it's selected"""
+        if self.selected_row == data_index + 1:
+            return self.selected_row_colour
+
+        return self.data_colour
+
+    def change_pool_row_colour(self, pool_index, colour):
+        """Sets the colour for all the cells in a pool row"""
+        for cell in self.row_pool[pool_index]["frame"].winfo_children():
+            cell.configure(fg_color=colour)
+
+    def get_pool_index(self, event):
+        """Returns the index of the pool row containing the cell the event happened in"""
+        # event.widget is the tkinter Entry inside the CTkEntry, which is inside the
+        # row's frame
+        return event.widget.master.master.pool_index
+
+    def click_row(self, event):
+        """
+        Handles what happens when a row is clicked - colour changes and calling the
+        callback funtion
+        """
+        pool_index = self.get_pool_index(event)
+        previously_selected_row = self.selected_row
+        # selected_row counts the header as row 0, as in CustomTable
+        self.selected_row = self.pool_data_indexes[pool_index] + 1
+
+        # the previously selected row may have been scrolled out of view
+        if previously_selected_row is not None:
+            previous_data_index = previously_selected_row - 1
+            if previous_data_index in self.pool_data_indexes:
+                self.change_pool_row_colour(
+                    self.pool_data_indexes.index(previous_data_index), self.data_colour
+                )
+
+        self.change_pool_row_colour(pool_index, self.selected_row_colour)
+
+        # call callback function
+        if self.on_row_select_callback:
+            self.on_row_select_callback()
+
+    def update_table_appearance(self, event, colour):
+        """
+        Determines if a different row has been selected, and changes the colours if
+        necessary
+        """
+        pool_index = self.get_pool_index(event)
+        data_index = self.pool_data_indexes[pool_index]
+
+        if data_index is not None and data_index + 1 != self.selected_row:
+            self.change_pool_row_colour(pool_index, colour)
+
+
+def get_table_class(data):
+    """
+    Returns VirtualisedCustomTable if there is too much data for a CustomTable to
+    display quickly, otherwise CustomTable
+    """
+    if len(data) > config.VIRTUALISED_TABLE_MIN_NUM_ROWS:
+        return VirtualisedCustomTable
+
+    return CustomTable
+
+def create_table(master, data, columns, **kwargs):
+    """Creates whichever type of table is best for displaying the data"""
+    return get_table_class(data)(master, data, columns, **kwargs)
@@ -3,6 +3,7 @@ from UI.view_items_frame import ViewItemsFrame
 from UI.add_new_item_frame import AddNewItemFrame
 from UI.low_stock_frame import LowStockFrame
 from UI.splash import Splash
+from UI.messagebox import MessageBox
 
 class DBTabView(customtkinter.CTkTabview):
     """The main view which controls which of the main frames is being displayed"""
@@ -35,20 +36,20 @@ class DBTabView(customtkinter.CTkTabview):
             self.tab(self.TAB_NAMES[i]).grid_rowconfigure(0, weight=1)
             self.tab(self.TAB_NAMES[i]).grid_columnconfigure(0, weight=1)
 
+        self.subscribe_to_database_changes()
+
         splash_screen.destroy()
 
     def create_view_items_frame(self):
         return ViewItemsFrame(
             master=self.tab(self.TAB_NAMES[self.VIEW_ITEMS_FRAME_INDEX]),
-            presenter=self.presenter,
-            tab_view=self
+            presenter=self.presenter
         )
 
     def create_add_new_item_frame(self):
         return AddNewItemFrame(
             master=self.tab(self.TAB_NAMES[self.ADD_NEW_ITEM_FRAME_INDEX]),
-            presenter=self.presenter,
-            tab_view=self
+            presenter=self.presenter
         )
 
     def create_low_stock_frame(self):
@@ -61,44 +62,81 @@ class DBTabView(customtkinter.CTkTabview):
         """Displays the given frame"""
         frame.grid(row=0, column=0, sticky="nesw")
 
-    def _reload_tab_contents(self, tab_num, replacement_frame):
-        """Replaces the specified frame in this tab_view with a new one"""
-        frame = self.tab_frames[tab_num]
-        frame.destroy()
-        self.display_frame_in_grid(replacement_frame)
-        self.tab_frames[tab_num] = replacement_frame
-
-    def _reload_view_items_frame(self, display_components):
+    def subscribe_to_database_changes(self):
         """
-        Refreshes the ViewItemsFrame - display_components controls whether the
-        components are initially displayed rather than the default products
+        Registers the functions which update the affected parts of the UI whenever the
+        database is changed, rather than rebuilding every frame
         """
-        replacement_frame = self.create_view_items_frame()
-        self._reload_tab_contents(self.VIEW_ITEMS_FRAME_INDEX, replacement_frame)
-
-        if display_components:
-            replacement_frame.filter_bar.display_components()
-
-    def _reload_add_new_item_frame(self):
-        """Refreshes the AddNewItemFrame"""
-        replacement_frame = self.create_add_new_item_frame()
-        self._reload_tab_contents(self.ADD_NEW_ITEM_FRAME_INDEX, replacement_frame)
+        self.presenter.subscribe(self.presenter.STOCK_CHANGED, self.on_stock_changed)
+        self.presenter.subscribe(self.presenter.ITEM_ADDED, self.on_item_added)
+        self.presenter.subscribe(self.presenter.ITEM_DELETED, self.on_item_deleted)
+        self.presenter.subscribe(self.presenter.DESIGN_ADDED, self.on_design_added)
+        self.presenter.subscribe(
+            self.presenter.PRODUCT_TYPE_ADDED, self.on_product_type_added
+        )
+        self.presenter.subscribe(
+            self.presenter.LOW_STOCK_CROSSED, self.on_low_stock_crossed
+        )
 
-    def _reload_low_stock_frame(self):
-        """Refreshes the LowStockFrame"""
-        replacement_frame = self.create_low_stock_frame()
-        self._reload_tab_contents(self.LOW_STOCK_FRAME_INDEX, replacement_frame)
+    def on_stock_changed(self, product_ids, component_ids):
+        """Updates the tables which show the stock levels of the changed items"""
+        if product_ids:
+            self.view_items_frame.refresh_table(self.presenter.PRODUCT)
+        if component_ids:
+            self.view_items_frame.refresh_table(self.presenter.COMPONENT)
+
+        self.low_stock_frame.refresh_tables()
+
+    def on_item_added(self, item_type, name):
+        """Displays the new item, and clears the inputs used to add it"""
+        self.view_items_frame.refresh_table(item_type)
+        self.low_stock_frame.refresh_tables()
+        self.add_new_item_frame.clear_inputs()
+
+        if item_type == self.presenter.PRODUCT:
+            # the product may have a new colour
+            self.view_items_frame.refresh_filter_options()
+            self.add_new_item_frame.refresh_menu_options()
+
+    def on_item_deleted(self, item_type, item_id):
+        """Removes the deleted item from the UI"""
+        self.view_items_frame.refresh_table(item_type)
+        self.low_stock_frame.refresh_tables()
+
+        if item_type == self.presenter.PRODUCT:
+            # the product may have been the only one with its colour
+            self.view_items_frame.refresh_filter_options()
+            self.add_new_item_frame.refresh_menu_options()
+        elif item_type == self.presenter.COMPONENT:
+            # the component can no longer be selected for a new product
+            self.add_new_item_frame.reset_component_window()
+
+    def on_design_added(self, name, theme):
+        """
+        Adds the new design (and theme) to the filter options - AddNewItemFrame adds
+        the design to its own dropdown menu
+        """
+        self.view_items_frame.refresh_filter_options()
 
-    def reload_all_frames(self, display_components_in_view_items_frame=False):
+    def on_product_type_added(self, name, product_type, sub_type):
         """
-        Refreshes the UI with updated values. display_components_in_view_items_frame
-        controls whether the components should be initially displayed in the
-        ViewItemsFrame (e.g. immediately after updating the stock level of a component)
+        Adds the new type (and sub-type) to the filter options - AddNewItemFrame adds
+        the product type to its own dropdown menu
         """
-        splash = Splash(self)
+        self.view_items_frame.refresh_filter_options()
 
-        self._reload_view_items_frame(display_components_in_view_items_frame)
-        self._reload_add_new_item_frame()
-        self._reload_low_stock_frame()
+    def on_low_stock_crossed(self, items, max_items_to_list=3):
+        """
+        Tells the user which items have just become low on stock (only the first few
+        are listed so that the message fits in the pop-up)
+        """
+        item_descriptions = "\n".join(
+            f"{name} ({item_type.lower()}) - {stock} left"
+            for item_type, _, name, stock, _ in items[:max_items_to_list]
+        )
+        if len(items) > max_items_to_list:
+            item_descriptions += f"\n...and {len(items) - max_items_to_list} more"
 
-        splash.destroy()
+        MessageBox(
+            "Low Stock", f"These items are now low on stock:\n\n{item_descriptions}"
+        )
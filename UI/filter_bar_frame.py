@@ -36,6 +36,8 @@ class FilterBarFrame(customtkinter.CTkFrame):
         # widget position counter
         self.current_widget_num = 0
         self.input_widgets = []
+        # the after() ID of the filter update waiting for the user to stop typing
+        self.debounced_update_id = None
 
         # item type
         product_component_lbl_text = "Item Type:"
@@ -116,11 +118,30 @@ class FilterBarFrame(customtkinter.CTkFrame):
         self.add_label(label)
         self.add_input_widget(input_widget)
 
+    def on_entry_key_release(self, event):
+        """
+        Delays updating the table until the user has stopped typing for
+        config.FILTER_DEBOUNCE_MS, so rapid key presses only cause one update
+        """
+        self.cancel_debounced_update()
+        self.debounced_update_id = self.after(
+            config.FILTER_DEBOUNCE_MS, self.on_filter_widget_update, None
+        )
+
+    def cancel_debounced_update(self):
+        """Cancels the filter update that is waiting for the user to stop typing"""
+        if self.debounced_update_id is not None:
+            self.after_cancel(self.debounced_update_id)
+            self.debounced_update_id = None
+
     def on_filter_widget_update(self, event):
         """
         Function to be run when any of the filter widgets have been updated, regardless
         of whether their values have actually been changed
         """
+        # the current values of all the filters are used, including any text still
+        # waiting to be applied
+        self.cancel_debounced_update()
         new_filter_values = self.get_current_filter_values()
 
         #check whether table needs updating
@@ -146,7 +167,7 @@ class FilterBarFrame(customtkinter.CTkFrame):
         # if the widget is a CTkEntry then the command needs to be added differently to
         # other widgets
         if isinstance(widget, customtkinter.CTkEntry):
-            widget.bind("<KeyRelease>", command=self.on_filter_widget_update)
+            widget.bind("<KeyRelease>", command=self.on_entry_key_release)
         else:
             widget.configure(command=self.on_filter_widget_update)
 
@@ -162,6 +183,11 @@ class FilterBarFrame(customtkinter.CTkFrame):
             "Colour": self.colour_dropdown.get()
         }
 
+    def destroy(self):
+        """Cancels any waiting filter update before destroying the filter bar"""
+        self.cancel_debounced_update()
+        super().destroy()
+
     def change_product_widgets_state(self, new_state):
         """
         Sets whether the widgets that are used for filtering just products (not
@@ -175,12 +201,38 @@ class FilterBarFrame(customtkinter.CTkFrame):
             if widget not in component_compatible_widgets:
                 widget.configure(state=new_state)
 
-    def display_components(self):
+    def set_dropdown_options(
+        self,
+        design_options,
+        theme_options,
+        type_options,
+        sub_type_options,
+        colour_options
+    ):
         """
-        Shows the components rather than the product. This method is needed so that
-        after adjusting a component's stock levels, the UI will still be showing the
-        components after the UI refreshes.
+        Replaces the options of the dropdown menus, e.g. after a new design has been
+        added. If a selected option no longer exists, the dropdown is reset to the empty
+        (unfiltered) option and the table is updated.
         """
-        self.product_component_switch.set("Component")
-        # forces the components to be displayed, as setting the switch doesn't do that
-        self.on_filter_widget_update(None)
+        options_lists = [
+            design_options, theme_options, type_options, sub_type_options, colour_options
+        ]
+        prepare_dropdown_options_lists(options_lists)
+        dropdowns = [
+            self.design_dropdown,
+            self.design_theme_dropdown,
+            self.type_dropdown,
+            self.sub_type_dropdown,
+            self.colour_dropdown
+        ]
+        selected_option_removed = False
+
+        for dropdown, options in zip(dropdowns, options_lists):
+            dropdown.configure(values=options)
+
+            if dropdown.get() not in options:
+                dropdown.set("")
+                selected_option_removed = True
+
+        if selected_option_removed:
+            self.on_filter_widget_update(None)
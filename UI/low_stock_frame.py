@@ -1,43 +1,178 @@
 import customtkinter
-from UI.custom_table import CustomTable
+from UI.custom_table import create_table
 from UI import config
+from UI.utilities import call_when_done
 
 class LowStockFrame(customtkinter.CTkFrame):
     """
     A frame which displays the items which have a stock level less than or equal to
-    their stock warning value
+    their stock warning value, and the items which are predicted to run out soon, along
+    with how many days of stock they have left
     """
 
     def __init__(self, master, presenter):
         super().__init__(master)
         self.presenter = presenter
+        # each table is stored as a dict of the table and where it is in the grid
+        self.tables = []
+        # the Future of the most recent query for the low stock tables' data
+        self.table_data_request = None
+        # the Future of the most recent query for the predicted low stock tables' data
+        self.predicted_data_request = None
+        # the ID of the scheduled refresh of the predicted low stock tables
+        self.predicted_refresh_id = None
 
+        low_stock_product_data, low_stock_component_data = self.get_low_stock_data()
         # product table
-        low_stock_product_data = self.presenter.get_low_stock_items(
-            products=True, components=False
-        )
         self.add_table("Low Stock Products", 0, low_stock_product_data)
-
         #component table
-        low_stock_component_data = self.presenter.get_low_stock_items(
-            products=False, components=True
-        )
         self.add_table("Low Stock Components", 2, low_stock_component_data)
+        # predicted low stock tables - these read every item's sales, so they are
+        # filled in once their query has finished rather than delaying the app starting
+        self.first_predicted_table_num = len(self.tables)
+        days = config.PREDICTED_LOW_STOCK_DAYS
+        self.add_table(f"Products Predicted To Run Out Within {days} Days", 4, None)
+        self.add_table(f"Components Predicted To Run Out Within {days} Days", 6, None)
+        self.refresh_predicted_tables()
 
         self.grid_columnconfigure(0, weight=1) #puts everything in the middle
 
+    def get_low_stock_data(self):
+        """
+        Returns the low stock products and the low stock components, using a single
+        query which reads the low stock indexes (this runs in the database thread when
+        the tables are refreshed)
+        """
+        return self.split_by_item_type(
+            self.presenter.get_low_stock_items(include_days_of_cover=True)
+        )
+
+    def get_predicted_low_stock_data(self):
+        """
+        Returns the products and the components which aren't low on stock yet but are
+        predicted to run out within config.PREDICTED_LOW_STOCK_DAYS (this runs in the
+        slow query thread)
+        """
+        return self.split_by_item_type(
+            self.presenter.get_low_stock_items(
+                predicted_low_days=config.PREDICTED_LOW_STOCK_DAYS
+            )
+        )
+
+    def split_by_item_type(self, items):
+        """
+        Splits the items into the products and the components, as a product and a
+        component can have the same name, which the tables use to match up the rows
+        when they are updated
+        """
+        # the last column is the item type, which the tables' titles show instead
+        column_names = items["column_names"][:-1]
+        rows_by_item_type = {"Product": [], "Component": []}
+
+        for row in items["data"]:
+            rows_by_item_type[row[-1]].append(row[:-1])
+
+        return tuple(
+            {"column_names": column_names, "data": rows_by_item_type[item_type]}
+            for item_type in ("Product", "Component")
+        )
+
     def create_label(self, text, font_size=25):
         """Creates labels with the same appearance"""
         return customtkinter.CTkLabel(self, text=text, font=(None, font_size))
 
     def add_table(self, title, starting_row_index, item_data, space_between_tables=50):
-        """Adds a table to the frame at the given starting row"""
+        """
+        Adds a table to the frame at the given starting row. If item_data is None, the
+        table is created when its data is first displayed.
+        """
         title_label = self.create_label(title)
         title_label.grid(row=starting_row_index, column=0, pady=config.WIDGET_Y_PADDING)
-        table = CustomTable(self, item_data["data"], item_data["column_names"])
+
+        self.tables.append({
+            "table": None,
+            "row": starting_row_index+1,
+            # the pady is to create a gap between the different tables
+            "pady": (0, space_between_tables)
+        })
+
+        if item_data is not None:
+            self.display_table_data(len(self.tables) - 1, item_data)
+
+    def display_table_data(self, table_num, item_data):
+        """
+        Displays the item data in the table - only the changed rows are updated if the
+        table can display the data, otherwise the table is replaced with a new one
+        """
+        table_info = self.tables[table_num]
+        table = table_info["table"]
+
+        if table is not None:
+            if table.can_display(item_data["data"], item_data["column_names"]):
+                table.update_data(item_data["data"])
+                return
+
+            table.remove()
+
+        table = create_table(self, item_data["data"], item_data["column_names"])
         table.grid(
-            row=starting_row_index+1,
-            column=0,
-            sticky="nsew",
-            pady=(0, space_between_tables) # the pady is to create a gap between the different tables
+            row=table_info["row"], column=0, sticky="nsew", pady=table_info["pady"]
         )
+        table_info["table"] = table
+
+    def refresh_tables(self):
+        """
+        Updates the low stock tables after stock levels have changed or items have been
+        added or deleted. The data is queried in the database thread, and the results of
+        older queries are ignored. The predicted low stock tables aren't updated, as
+        they are refreshed on their own schedule - see refresh_predicted_tables().
+        """
+        if self.table_data_request is not None:
+            self.table_data_request.cancel()
+
+        request = self.presenter.submit(self.get_low_stock_data)
+        self.table_data_request = request
+
+        def on_query_finished(all_item_data):
+            if request is not self.table_data_request: # ignore outdated results
+                return
+
+            for table_num, item_data in enumerate(all_item_data):
+                self.display_table_data(table_num, item_data)
+
+        call_when_done(self, request, on_query_finished)
+
+    def refresh_predicted_tables(self):
+        """
+        Updates the predicted low stock tables, then schedules the next update after
+        config.PREDICTED_LOW_STOCK_REFRESH_MS. Sales build up slowly, so this is much
+        less often than the low stock tables are refreshed. The query reads every
+        item's sales, so it runs in the presenter's slow query thread rather than
+        holding up the database thread.
+        """
+        if self.predicted_data_request is not None:
+            self.predicted_data_request.cancel()
+
+        request = self.presenter.submit_slow_query(self.get_predicted_low_stock_data)
+        self.predicted_data_request = request
+
+        def on_query_finished(all_item_data):
+            if request is not self.predicted_data_request: # ignore outdated results
+                return
+
+            for table_num, item_data in enumerate(
+                all_item_data, start=self.first_predicted_table_num
+            ):
+                self.display_table_data(table_num, item_data)
+
+        call_when_done(self, request, on_query_finished)
+        self.predicted_refresh_id = self.after(
+            config.PREDICTED_LOW_STOCK_REFRESH_MS, self.refresh_predicted_tables
+        )
+
+    def destroy(self):
+        """Cancels the scheduled predicted low stock refresh before destroying the frame"""
+        if self.predicted_refresh_id is not None:
+            self.after_cancel(self.predicted_refresh_id)
+
+        super().destroy()
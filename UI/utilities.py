@@ -1,4 +1,5 @@
 """Functions that are used in more than one class"""
+from UI import config
 
 def prepare_dropdown_options_lists(list_of_options_lists):
     """
@@ -10,3 +11,22 @@ def prepare_dropdown_options_lists(list_of_options_lists):
         options.sort(key=str.lower) # alphabetise list
 
         options.insert(0, "") # add empty string at start
+
+def call_when_done(widget, future, callback):
+    """
+    Calls callback with the result of the future (e.g. from Presenter.submit()) once it
+    has finished. Tk widgets must only be used from the Tk thread, so rather than the
+    database thread calling the callback, the future is checked every
+    config.QUERY_POLL_MS using widget.after(). Nothing is called if the future was
+    cancelled or the widget has been destroyed.
+    """
+    def check_future():
+        if not widget.winfo_exists() or future.cancelled():
+            return
+
+        if future.done():
+            callback(future.result()) # re-raises any exception from the query
+        else:
+            widget.after(config.QUERY_POLL_MS, check_future)
+
+    check_future()
@@ -1,6 +1,7 @@
 import customtkinter
 from tkinter import StringVar
-from UI.custom_table import CustomTable
+from UI.custom_table import CustomTable, create_table
+from UI.utilities import call_when_done
 from UI.filter_bar_frame import FilterBarFrame
 from UI.adjust_stock_level_popup import AdjustStockLevelPopup
 from UI.messagebox import MessageBox
@@ -11,11 +12,12 @@ from tkinter import NORMAL, DISABLED
 class ViewItemsFrame(customtkinter.CTkFrame):
     """Displays all the products/components according to the filters"""
 
-    def __init__(self, master, presenter, tab_view):
+    def __init__(self, master, presenter):
         super().__init__(master)
         self.master = master
         self.presenter = presenter
-        self.tab_view = tab_view
+        # the Future of the most recent query for the table's data
+        self.table_data_request = None
 
         self.init_filter_bar()
 
@@ -30,33 +32,80 @@ class ViewItemsFrame(customtkinter.CTkFrame):
         self.grid_rowconfigure(1, weight=1)
 
     def update_table(self, filters):
-        """Removes the current table and adds a new one based on the current filters"""
-        self.table.grid_forget()
-        full_data = self.presenter.get_filtered_items(filters)
-        self.create_table(full_data["data"], full_data["column_names"])
+        """
+        Queries the items matching the filters in the database thread, and displays them
+        when the query has finished. A query which hasn't started yet is cancelled if
+        the filters change again, and the results of older queries are ignored.
+        """
+        if self.table_data_request is not None:
+            self.table_data_request.cancel()
+
+        request = self.presenter.submit(self.presenter.get_filtered_items, filters)
+        self.table_data_request = request
+
+        def on_query_finished(full_data):
+            if request is self.table_data_request: # ignore outdated results
+                self.display_table_data(full_data)
+
+        call_when_done(self, request, on_query_finished)
+
+    def display_table_data(self, full_data):
+        """
+        Displays the items in the table. If the table can display the new data (the
+        columns are the same and it's the right type of table for the amount of data)
+        only the changed rows are updated, otherwise the table is replaced with a new
+        one.
+        """
+        data_rows, column_names = full_data["data"], full_data["column_names"]
+
+        if self.table.can_display(data_rows, column_names):
+            self.table.update_data(data_rows)
+        else:
+            self.table.remove()
+            self.create_table(data_rows, column_names)
+
+        # the selected item may have been filtered out
+        if self.table.selected_row is None:
+            self.set_buttons_to_starting_states()
+
+    def refresh_table(self, item_type):
+        """
+        Re-displays the items matching the current filters if items of the given type
+        (product or component) are being displayed, e.g. after their stock levels have
+        changed
+        """
+        current_filter_values = self.filter_bar.current_filter_values
+
+        if current_filter_values["Item Type"] == item_type:
+            self.update_table(current_filter_values)
+
+    def get_filter_options(self):
+        """Gets the options for each of the filter bar's dropdown menus"""
+        return [
+            self.presenter.get_product_designs(),
+            self.presenter.get_product_themes(),
+            self.presenter.get_product_types(),
+            self.presenter.get_product_sub_types(),
+            self.presenter.get_product_colours()
+        ]
+
+    def refresh_filter_options(self):
+        """
+        Updates the options of the filter bar's dropdown menus, e.g. after a new design
+        has been added
+        """
+        self.filter_bar.set_dropdown_options(*self.get_filter_options())
 
     def init_filter_bar(self):
         """Sets up the filter bar"""
-        design_options = self.presenter.get_product_designs()
-        theme_options = self.presenter.get_product_themes()
-        type_options = self.presenter.get_product_types()
-        sub_type_options = self.presenter.get_product_sub_types()
-        colour_options =  self.presenter.get_product_colours()
-
         self.filter_bar = FilterBarFrame(
-            self,
-            design_options,
-            theme_options,
-            type_options,
-            sub_type_options,
-            colour_options,
-            self.set_buttons_to_starting_states
+            self, *self.get_filter_options(), self.set_buttons_to_starting_states
         )
         self.filter_bar.grid(row=0, column=0, pady=10)
 
     def create_table(self, data_rows, column_names):
         """Adds a new table with the given data and column names"""
-        self.table = CustomTable(self, data_rows, column_names, self.update_button_states)
+        self.table = create_table(self, data_rows, column_names, self.update_button_states)
         self.table.grid(row=1, column=0, sticky="nsew")
 
     def create_buttons(self):
@@ -108,8 +157,7 @@ class ViewItemsFrame(customtkinter.CTkFrame):
             selected_item_name,
             selected_item_id,
             selected_item_type,
-            self.presenter,
-            self.tab_view
+            self.presenter
         )
 
     def on_view_components_button_click(self):
@@ -152,8 +200,7 @@ class ViewItemsFrame(customtkinter.CTkFrame):
             selected_item_name,
             selected_item_id,
             selected_item_type,
-            self.presenter,
-            self.tab_view
+            self.presenter
         )
 
     def get_selected_item_info(self):
@@ -228,10 +275,9 @@ class ViewProductsComponentsPopup(SmallPopup):
 
 class ConfirmItemDeletePopup(SmallPopup):
     """
-    A pop-up to confirm the user wants to delete the item - also refreshes the UI
-    after deleting the item
+    A pop-up to confirm the user wants to delete the item
     """
-    def __init__(self, item_name, item_id, item_type, presenter, tab_view):
+    def __init__(self, item_name, item_id, item_type, presenter):
         super().__init__()
         self.geometry("350x200")
         self.title(f"Delete {item_type}?")
@@ -239,7 +285,6 @@ class ConfirmItemDeletePopup(SmallPopup):
         self.item_id = item_id
         self.item_type = item_type
         self.presenter = presenter
-        self.tab_view = tab_view
 
         self.grid_columnconfigure(0, weight=1)
 
@@ -275,14 +320,15 @@ class ConfirmItemDeletePopup(SmallPopup):
         self.centre_popup() # position in centre
 
     def on_yes_button_click(self):
-        """Deletes the item from the database"""
+        """
+        Deletes the item from the database (the presenter notifies the UI so that it
+        can update)
+        """
         if self.item_type == "Product":
             self.presenter.delete_product(self.item_id)
-            self.tab_view.reload_all_frames()
             self.release_focus_and_hide()
         elif self.item_type == "Component":
             self.presenter.delete_component(self.item_id)
-            self.tab_view.reload_all_frames(display_components_in_view_items_frame=True)
             self.release_focus_and_hide()
 
         MessageBox(
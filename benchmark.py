@@ -0,0 +1,212 @@
+"""
+Micro-benchmarks for the database_manager.py functions, to check that performance
+changes actually make a difference. Run with "python benchmark.py".
+"""
+import random
+import timeit
+from database_manager import DatabaseManager
+
+def _print_result(description, total_seconds, num_calls):
+    """Prints the average time per call in microseconds"""
+    microseconds_per_call = (total_seconds / num_calls) * 1_000_000
+    print(f"{description}: {microseconds_per_call:.2f} µs per call")
+
+def benchmark_validation(num_calls=10_000):
+    """
+    Compares the cost of validating a table name and column names when the schema is
+    re-queried for every call (the old behaviour) against using the schema cache
+    """
+    db = DatabaseManager(save_database_in_memory=True)
+
+    def uncached_validation():
+        db.load_schema_cache() # forces the schema to be re-queried, as before caching
+        db.validate_table_name("Product")
+        db.validate_column_names(["product_id", "name"])
+
+    def cached_validation():
+        db.validate_table_name("Product")
+        db.validate_column_names(["product_id", "name"])
+
+    print("--- Table/column name validation ---")
+    _print_result(
+        "Before (schema queried every call)",
+        timeit.timeit(uncached_validation, number=num_calls),
+        num_calls
+    )
+    _print_result(
+        "After (cached schema)",
+        timeit.timeit(cached_validation, number=num_calls),
+        num_calls
+    )
+
+    db.close_connection()
+
+def _insert_synthetic_catalogue(db, num_products):
+    """Fills the database with a large number of randomly generated products"""
+    random.seed(0)
+    colours = ["black", "white", "pink", "blue", "yellow", "glow", "red", "green"]
+    types = ["earring", "necklace", "bauble", "keyring", "brooch"]
+    sub_types = [None, "metal chain", "fully plastic", "clip-on"]
+
+    db.insert_many(
+        "Design",
+        [[f"Design{i}", f"Theme{i % 20}"] for i in range(500)]
+    )
+    db.insert_many(
+        "ProductType",
+        [
+            [f"Type{i}", types[i % len(types)], sub_types[i % len(sub_types)]]
+            for i in range(20)
+        ]
+    )
+    db.insert_many(
+        "Product",
+        [
+            [
+                f"Product{i}",
+                random.choice(colours),
+                random.randint(0, 50),
+                random.randint(0, 10),
+                random.randint(1, 500),
+                random.randint(1, 20)
+            ]
+            for i in range(num_products)
+        ]
+    )
+
+def _get_query_plan(db, func, **kwargs):
+    """
+    Runs the database function and returns the query plan of the query it performed,
+    with each step of the plan separated by semicolons
+    """
+    executed_queries = []
+    # the trace callback receives each query with the parameter values filled in
+    db.connection.set_trace_callback(executed_queries.append)
+    func(**kwargs)
+    db.connection.set_trace_callback(None)
+
+    plan_rows = db.execute_query_and_list_results(
+        "EXPLAIN QUERY PLAN " + executed_queries[-1]
+    )
+    return "; ".join(row[3] for row in plan_rows)
+
+def benchmark_filter_indexes(num_products=100_000, num_calls=20):
+    """
+    Compares the query plans and timings of view_filtered_products() and
+    view_low_stock_items() with and without the indexes from create_indexes()
+    (including the partial low stock indexes)
+    """
+    db = DatabaseManager(save_database_in_memory=True)
+    _insert_synthetic_catalogue(db, num_products)
+
+    filters = {
+        "design": {"design": "Design7"},
+        "theme": {"design_theme": "Theme3"},
+        "type + sub-type": {"product_type": "necklace", "subtype": "metal chain"},
+        "colour": {"colour": "glow"},
+        "stock level": {"stock_level": 7}
+    }
+
+    def run_benchmarks(description):
+        print(f"--- {description} ---")
+        for filter_name, filter_kwargs in filters.items():
+            _print_result(
+                f"Filter by {filter_name}",
+                timeit.timeit(
+                    lambda: db.view_filtered_products(**filter_kwargs), number=num_calls
+                ),
+                num_calls
+            )
+            print("    plan:", _get_query_plan(db, db.view_filtered_products, **filter_kwargs))
+        _print_result(
+            "Low stock items",
+            timeit.timeit(db.view_low_stock_items, number=num_calls),
+            num_calls
+        )
+        print("    plan:", _get_query_plan(db, db.view_low_stock_items))
+
+    db.cursor.execute("ANALYZE")
+    run_benchmarks(f"With indexes, {num_products} products")
+
+    for index_name, _, _ in DatabaseManager.INDEXES:
+        db.cursor.execute(f"DROP INDEX {index_name}")
+    for index_name, _ in DatabaseManager.LOW_STOCK_INDEXES:
+        db.cursor.execute(f"DROP INDEX {index_name}")
+    db.cursor.execute("ANALYZE")
+    run_benchmarks(f"Without indexes, {num_products} products")
+
+    db.close_connection()
+
+def benchmark_name_search(num_products=100_000, num_calls=20):
+    """
+    Compares searching product names with the full-text search index against using
+    LIKE on the Product table
+    """
+    db = DatabaseManager(save_database_in_memory=True)
+    _insert_synthetic_catalogue(db, num_products)
+
+    print(f"--- Name search, {num_products} products ---")
+    for name_search_enabled in (False, True):
+        db.name_search_enabled = name_search_enabled
+        _print_result(
+            "Full-text search index" if name_search_enabled else "LIKE on Product",
+            timeit.timeit(
+                lambda: db.view_filtered_products(name_search="duct1234"),
+                number=num_calls
+            ),
+            num_calls
+        )
+
+    db.close_connection()
+
+def benchmark_sales_velocity(num_products=50_000, num_movements=500_000, num_calls=5):
+    """
+    Times view_sales_velocity() and the days of cover and predicted low modes of
+    view_low_stock_items() with a movement history spread over the last 120 days
+    """
+    db = DatabaseManager(save_database_in_memory=True)
+    _insert_synthetic_catalogue(db, num_products)
+
+    with db.connection:
+        db.cursor.executemany(
+            """INSERT INTO StockMovement (item_type, item_id, change, reason, moved_at)
+               VALUES ('Product', ?, ?, 'sale', strftime('%Y-%m-%d %H:%M:%f', 'now', ?))""",
+            [
+                (
+                    random.randint(1, num_products),
+                    -random.randint(1, 3),
+                    f"-{random.randint(0, 119)} days"
+                )
+                for _ in range(num_movements)
+            ]
+        )
+    db.cursor.execute("ANALYZE")
+
+    print(f"--- Sales velocity, {num_products} products, {num_movements} movements ---")
+    _print_result(
+        "Sales velocity",
+        timeit.timeit(db.view_sales_velocity, number=num_calls),
+        num_calls
+    )
+    _print_result(
+        "Low stock items with days of cover",
+        timeit.timeit(
+            lambda: db.view_low_stock_items(include_days_of_cover=True), number=num_calls
+        ),
+        num_calls
+    )
+    _print_result(
+        "Predicted low stock items",
+        timeit.timeit(
+            lambda: db.view_low_stock_items(predicted_low_days=14), number=num_calls
+        ),
+        num_calls
+    )
+
+    db.close_connection()
+
+if __name__ == "__main__":
+    benchmark_validation()
+    benchmark_filter_indexes()
+    benchmark_name_search()
+    benchmark_sales_velocity()
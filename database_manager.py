@@ -1,25 +1,296 @@
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+class DuplicateNameError(sqlite3.IntegrityError):
+    """
+    Raised when a bulk insert fails because some of the rows have names which are
+    already in use. colliding_rows is a list of (row index, name) tuples.
+    """
+
+    def __init__(self, colliding_rows):
+        colliding_names = [name for _, name in colliding_rows]
+        super().__init__(f"Name(s) already in use: {colliding_names}")
+        self.colliding_rows = colliding_rows
 
 class DatabaseManager:
     """The database class for storing, modifying and accessing the inventory"""
+    # the primary key column of each of the tables which have a name column
+    ID_COLUMN_NAMES = {
+        "Design": "design_id",
+        "ProductType": "product_type_id",
+        "Product": "product_id",
+        "Component": "component_id"
+    }
+    # kept below the lowest limit of older sqlite versions (999)
+    MAX_QUERY_PARAMETERS = 500
+    # the sqlite settings for each performance profile. WAL mode means that reading the
+    # database doesn't block writing to it (and vice versa). "durable" keeps sqlite's
+    # default of syncing every commit to disc, "fast" only syncs at WAL checkpoints
+    # (a power cut can lose the last few commits but won't corrupt the database), and
+    # "bulk" never syncs so should only be used for imports that can be re-run.
+    # A negative cache_size is in KiB rather than pages.
+    PERFORMANCE_PROFILES = {
+        "durable": {
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+            "cache_size": -2000,
+            "temp_store": "MEMORY",
+            "mmap_size": 0
+        },
+        "fast": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -16000,
+            "temp_store": "MEMORY",
+            "mmap_size": 64 * 1024 * 1024
+        },
+        "bulk": {
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "cache_size": -64000,
+            "temp_store": "MEMORY",
+            "mmap_size": 256 * 1024 * 1024
+        }
+    }
+    # (index name, table name, column names) of each of the indexes on the tables
+    INDEXES = (
+        ("DesignThemeIndex", "Design", "theme"),
+        ("ProductTypeTypeIndex", "ProductType", "type, sub_type"),
+        ("ProductTypeSubTypeIndex", "ProductType", "sub_type"),
+        ("ProductColourIndex", "Product", "colour"),
+        # stock is first so that this can also be used when filtering on stock
+        ("ProductStockIndex", "Product", "stock, low_stock_warning"),
+        ("ProductDesignIndex", "Product", "design_id"),
+        ("ProductProductTypeIndex", "Product", "product_type_id"),
+        ("ComponentStockIndex", "Component", "stock, low_stock_warning"),
+        # the primary key index can't be used to look up by component_id on its own
+        ("MadeUsingComponentIndex", "MadeUsing", "component_id"),
+        # an item's movements in order, for adding up the movements after a snapshot
+        ("StockMovementItemIndex", "StockMovement", "item_type, item_id, movement_id"),
+        # each item's movements are next to each other, so the sales velocities can be
+        # added up without sorting the movements or reading the table
+        (
+            "StockMovementItemTimeIndex",
+            "StockMovement",
+            "item_type, item_id, moved_at, change"
+        ),
+        ("StockSnapshotItemIndex", "StockSnapshot", "item_type, item_id, taken_at"),
+        ("StockSnapshotMovementIndex", "StockSnapshot", "last_movement_id")
+    )
+    # (index name, table name) of the partial indexes which only contain the table's
+    # low stock items, so view_low_stock_items() reads just those items rather than
+    # scanning the table. sqlite keeps them up-to-date as stock levels change, and they
+    # include every column the query uses so the table itself isn't read.
+    LOW_STOCK_INDEXES = (
+        ("ProductLowStockIndex", "Product"),
+        ("ComponentLowStockIndex", "Component")
+    )
+    # a snapshot of every item's stock level is taken after this many stock movements,
+    # so view_stock_as_of() never has to add up more movements than this per item
+    STOCK_SNAPSHOT_INTERVAL = 10_000
+    # the format of the timestamps in StockMovement and StockSnapshot (UTC)
+    TIMESTAMP_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    # the number of days that sales velocities are worked out over, and which of them
+    # days of cover is based on - see view_sales_velocity()
+    SALES_VELOCITY_WINDOWS = (7, 30, 90)
+    DAYS_OF_COVER_WINDOW = 30
+    # the tables which have a full-text search index on their name column
+    NAME_SEARCH_TABLES = ("Product", "Component")
+    # the number of read-only connections that queries outside of a write transaction
+    # share - see _read_connection()
+    DEFAULT_NUM_READERS = 4
+    # the settings of the performance profiles which a read-only connection can use
+    READER_SETTINGS = ("cache_size", "temp_store", "mmap_size")
+    # sqlite returns some settings as numbers, so these convert them back to names
+    SYNCHRONOUS_NAMES = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+    TEMP_STORE_NAMES = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
 
     #connect to database
-    def __init__(self, save_database_in_memory=False):
+    def __init__(
+        self,
+        save_database_in_memory=False,
+        profile="durable",
+        num_readers=DEFAULT_NUM_READERS
+    ):
         """
         save_database_in_memory=True creates the database in memory rather than
-        disc - for testing purposes
+        disc - for testing purposes.
+        profile is the name of one of the PERFORMANCE_PROFILES, which trade off
+        durability against speed.
+        num_readers is the number of read-only connections which are opened so that
+        several threads can query the database at once, while writes go through the
+        single writer connection one at a time. An in-memory database can't be opened
+        by another connection, so it always uses the writer connection for reading.
+        The DatabaseManager can be used by any thread.
         """
+        if profile not in self.PERFORMANCE_PROFILES:
+            raise ValueError(f"Performance profile {profile} not valid!")
+
         self.database_file_name = (
             "inventory.db" if not save_database_in_memory else ":memory:"
         )
-        self.connection = sqlite3.connect(self.database_file_name)
+        # the writer connection - self.cursor must only be used while holding
+        # writer_lock, see write_transaction()
+        self.connection = sqlite3.connect(self.database_file_name, check_same_thread=False)
         self.cursor = self.connection.cursor()
+        # reentrant so that a write method can call other write methods
+        self.writer_lock = threading.RLock()
+        # how many write_transaction()s each thread is inside
+        self.thread_state = threading.local()
+        # the read-only connections which aren't being used - filled by open_readers()
+        self.readers = None
+        self.reader_connections = []
+        # the read-only connection lent to each thread, and how many queries are using
+        # it, by thread ID - see _read_connection(). This isn't thread-local, as an
+        # iter_query() can be closed by a different thread to the one reading it.
+        self.reader_leases = {}
+        self.reader_leases_lock = threading.Lock()
+
+        self.profile = profile
+        self.apply_performance_profile()
 
         #create tables if they don't exist
         self.create_tables()
+        self.create_temp_tables()
+
+        if not save_database_in_memory and num_readers > 0:
+            self.open_readers(num_readers)
+
+        # whitelist of table/column names used to protect against SQL injection - it
+        # is cached so that the database schema isn't re-queried for every validation
+        self.load_schema_cache()
+
+    def open_readers(self, num_readers):
+        """
+        Opens the read-only connections, which are handed out to one query at a time by
+        _read_connection(). The database uses WAL mode, so they can read while the
+        writer connection is writing.
+        """
+        reader_uri = Path(self.database_file_name).resolve().as_uri() + "?mode=ro"
+        self.readers = queue.Queue()
+
+        for _ in range(num_readers):
+            reader = sqlite3.connect(reader_uri, uri=True, check_same_thread=False)
+
+            for setting in self.READER_SETTINGS:
+                value = self.PERFORMANCE_PROFILES[self.profile][setting]
+                reader.execute(f"PRAGMA {setting} = {value}")
+
+            self.reader_connections.append(reader)
+            self.readers.put(reader)
 
     def close_connection(self):
-        self.connection.close()
+        """
+        Closes every connection. Raises sqlite3.ProgrammingError, without closing
+        anything, if a read-only connection is still being used (e.g. by an iter_query()
+        which hasn't been finished or closed).
+        """
+        if self.readers is not None and self.readers.qsize() < len(self.reader_connections):
+            raise sqlite3.ProgrammingError(
+                "Can't close the database while read-only connections are in use"
+            )
+
+        for reader in self.reader_connections:
+            reader.close()
+
+        with self.writer_lock:
+            # updates the statistics which sqlite uses to choose which indexes to use
+            self.cursor.execute("PRAGMA optimize")
+            self.connection.close()
+
+    @contextmanager
+    def write_transaction(self):
+        """
+        Holds the writer connection for a write, so that only one thread writes at a
+        time, and commits when the outermost write_transaction() finishes (or rolls
+        back if an error occurs). Queries run inside it use the writer connection too,
+        so that they can see the uncommitted changes and the temporary tables.
+        """
+        with self.writer_lock:
+            depth = getattr(self.thread_state, "write_depth", 0)
+            self.thread_state.write_depth = depth + 1
+
+            try:
+                if depth > 0: # the outer write_transaction() commits
+                    yield self.cursor
+                else:
+                    with self.connection: # commits, or rolls back if an error occurs
+                        yield self.cursor
+            finally:
+                self.thread_state.write_depth = depth
+
+    @contextmanager
+    def _read_connection(self):
+        """
+        Lends a connection to a query - a read-only connection if there is one, or the
+        writer connection inside a write_transaction() or for an in-memory database.
+        If every read-only connection is in use, this waits for one to be returned.
+        A thread which already has a read-only connection (e.g. while iterating over
+        iter_query()) reuses it, so that it can't end up waiting for itself.
+        """
+        if self.readers is None or getattr(self.thread_state, "write_depth", 0) > 0:
+            with self.writer_lock:
+                yield self.connection
+            return
+
+        thread_id = threading.get_ident()
+        with self.reader_leases_lock:
+            lease = self.reader_leases.get(thread_id)
+
+        if lease is None:
+            # only this thread adds its own lease, so it can wait without the lock
+            lease = {"reader": self.readers.get(), "num_queries": 0}
+            with self.reader_leases_lock:
+                self.reader_leases[thread_id] = lease
+
+        with self.reader_leases_lock:
+            lease["num_queries"] += 1
+
+        try:
+            yield lease["reader"]
+        finally:
+            # the lease is found from thread_id rather than the current thread, as an
+            # iter_query() can be closed in another thread
+            with self.reader_leases_lock:
+                lease["num_queries"] -= 1
+                is_returned = lease["num_queries"] == 0
+                if is_returned:
+                    del self.reader_leases[thread_id]
+
+            if is_returned:
+                self.readers.put(lease["reader"])
+
+    def apply_performance_profile(self):
+        """Applies the settings of the database's performance profile to the connection"""
+        for setting, value in self.PERFORMANCE_PROFILES[self.profile].items():
+            # values come from PERFORMANCE_PROFILES rather than the user, and
+            # placeholders can't be used in PRAGMA statements
+            self.cursor.execute(f"PRAGMA {setting} = {value}")
+
+    def get_performance_settings(self):
+        """
+        Returns the values of the settings that the performance profile controls, as
+        reported by sqlite for the writer connection (the read-only connections only
+        have the READER_SETTINGS). These can differ from the profile, e.g. an in-memory
+        database's journal_mode is always 'memory' and it has no mmap_size (None).
+        """
+        settings = {}
+
+        # queries inside a write transaction use the writer connection
+        with self.write_transaction():
+            for setting in self.PERFORMANCE_PROFILES[self.profile]:
+                values = self.execute_query_and_list_results(
+                    f"PRAGMA {setting}", single_column_index=0
+                )
+                settings[setting] = values[0] if values else None
+
+        settings["synchronous"] = self.SYNCHRONOUS_NAMES[settings["synchronous"]]
+        settings["temp_store"] = self.TEMP_STORE_NAMES[settings["temp_store"]]
+
+        return settings
 
     def create_tables(self):
         """Sets up the tables if they don't already exist"""
@@ -74,14 +345,258 @@ class DatabaseManager:
                             );"""
         self.cursor.execute(made_using_str)
 
+        is_new_stock_ledger = not self.execute_query_and_list_results(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'StockMovement'"
+        )
+
+        # every change to a stock level, written by the triggers below
+        stock_movement_str = f"""CREATE TABLE IF NOT EXISTS StockMovement (
+                                     movement_id INTEGER PRIMARY KEY,
+                                     item_type VARCHAR(10) NOT NULL,
+                                     item_id INT NOT NULL,
+                                     change INT NOT NULL,
+                                     reason VARCHAR(50),
+                                     moved_at TEXT NOT NULL DEFAULT ({self.TIMESTAMP_SQL})
+                                 );"""
+        self.cursor.execute(stock_movement_str)
+
+        # the stock level of every item after the movement with last_movement_id
+        stock_snapshot_str = f"""CREATE TABLE IF NOT EXISTS StockSnapshot (
+                                     snapshot_id INTEGER PRIMARY KEY,
+                                     item_type VARCHAR(10) NOT NULL,
+                                     item_id INT NOT NULL,
+                                     stock INT NOT NULL,
+                                     last_movement_id INT NOT NULL,
+                                     taken_at TEXT NOT NULL DEFAULT ({self.TIMESTAMP_SQL})
+                                 );"""
+        self.cursor.execute(stock_snapshot_str)
+
+        # the stock movement triggers aren't temporary triggers, so that stock changes
+        # from any connection are recorded in the same transaction as the change.
+        # Stock updates are recorded without a reason, which the stock update methods
+        # then fill in - see _set_stock_movement_reason(). A deleted item's stock is
+        # written off with a 'deleted' movement, so its history is kept and still adds
+        # up. Product and Component IDs can be reused after the item with the highest
+        # ID is deleted, so an item's history only starts from its latest 'opening
+        # stock' movement - see _create_opening_movement_id_sql().
+        for table_name in ("Product", "Component"):
+            id_column_name = self.ID_COLUMN_NAMES[table_name]
+            self.cursor.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {table_name}StockMovementUpdate
+                    AFTER UPDATE OF stock ON {table_name}
+                    WHEN NEW.stock != OLD.stock
+                    BEGIN
+                        INSERT INTO StockMovement (item_type, item_id, change)
+                        VALUES ('{table_name}', NEW.{id_column_name}, NEW.stock - OLD.stock);
+                    END"""
+            )
+            # recorded even when the stock is 0, as it marks where the item's history
+            # starts
+            self.cursor.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {table_name}StockMovementInsert
+                    AFTER INSERT ON {table_name}
+                    BEGIN
+                        INSERT INTO StockMovement (item_type, item_id, change, reason)
+                        VALUES ('{table_name}', NEW.{id_column_name}, NEW.stock, 'opening stock');
+                    END"""
+            )
+            # older databases deleted the history instead
+            self.cursor.execute(f"DROP TRIGGER IF EXISTS {table_name}StockHistoryDelete")
+            self.cursor.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {table_name}StockMovementDelete
+                    AFTER DELETE ON {table_name}
+                    BEGIN
+                        INSERT INTO StockMovement (item_type, item_id, change, reason)
+                        VALUES ('{table_name}', OLD.{id_column_name}, -OLD.stock, 'deleted');
+                    END"""
+            )
+
+        self.create_indexes()
+        self.create_name_search_tables()
+
+        # the stock levels from before there was a stock history
+        if is_new_stock_ledger:
+            self.take_stock_snapshot(all_items=True)
+
+        self.connection.commit()
+
+    def create_temp_tables(self):
+        """
+        Sets up the temporary tables, which only exist for this connection and are
+        never saved to the database file. ProductQuantity holds the quantities of many
+        products, so that the components they use can be worked out in one query - see
+        _fill_product_quantity_table(). LowStockCrossing is filled by temporary triggers
+        with the items whose stock level drops to or below their low stock warning, so
+        the stock update methods can return the items which have just become low on
+        stock. Temporary triggers are used as they can read temporary tables.
+        """
+        self.cursor.execute("""CREATE TEMP TABLE IF NOT EXISTS ProductQuantity (
+                                   product_id INTEGER PRIMARY KEY,
+                                   quantity INT NOT NULL
+                               );""")
+        self.cursor.execute("""CREATE TEMP TABLE IF NOT EXISTS LowStockCrossing (
+                                   item_type TEXT NOT NULL,
+                                   item_id INTEGER NOT NULL,
+                                   name VARCHAR(50) NOT NULL,
+                                   stock INT NOT NULL,
+                                   low_stock_warning INT NOT NULL
+                               );""")
+
+        for table_name in ("Product", "Component"):
+            id_column_name = self.ID_COLUMN_NAMES[table_name]
+            self.cursor.execute(
+                f"""CREATE TEMP TRIGGER IF NOT EXISTS {table_name}LowStockCrossing
+                    AFTER UPDATE OF stock, low_stock_warning ON main.{table_name}
+                    WHEN OLD.stock > OLD.low_stock_warning
+                    AND NEW.stock <= NEW.low_stock_warning
+                    BEGIN
+                        INSERT INTO LowStockCrossing
+                        VALUES (
+                            '{table_name}',
+                            NEW.{id_column_name},
+                            NEW.name,
+                            NEW.stock,
+                            NEW.low_stock_warning
+                        );
+                    END"""
+            )
+
         self.connection.commit()
 
+    def create_indexes(self):
+        """
+        Sets up the indexes if they don't already exist. These are for the columns that
+        are filtered on by view_filtered_products(), view_low_stock_items() and the
+        joins between the tables (the name and primary key columns already have
+        indexes because they are UNIQUE).
+        """
+        for index_name, table_name, column_names in self.INDEXES:
+            self.cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}({column_names})"
+            )
+
+        # each item's 'opening stock' movements, so the start of an item's history can
+        # be found without reading all of its movements
+        self.cursor.execute(
+            """CREATE INDEX IF NOT EXISTS StockMovementOpeningIndex
+               ON StockMovement(item_type, item_id, movement_id)
+               WHERE reason = 'opening stock'"""
+        )
+
+        # the WHERE clause must match view_low_stock_items() for sqlite to use these
+        for index_name, table_name in self.LOW_STOCK_INDEXES:
+            self.cursor.execute(
+                f"""CREATE INDEX IF NOT EXISTS {index_name}
+                    ON {table_name}(name, stock, low_stock_warning)
+                    WHERE stock <= low_stock_warning"""
+            )
+
+    def create_name_search_tables(self):
+        """
+        Sets up a full-text search index on the name column of each of the
+        NAME_SEARCH_TABLES, if they don't already exist. The trigram tokenizer is used
+        as it lets sqlite use the index for LIKE '%...%' queries, and triggers keep the
+        index up-to-date with the table. If sqlite hasn't been compiled with FTS5 then
+        name searches fall back to using LIKE on the table itself.
+        """
+        self.name_search_enabled = True
+
+        for table_name in self.NAME_SEARCH_TABLES:
+            search_table_name = table_name + "NameSearch"
+            id_column_name = self.ID_COLUMN_NAMES[table_name]
+            is_new_search_table = not self.execute_query_and_list_results(
+                "SELECT name FROM sqlite_master WHERE name = ?", (search_table_name,)
+            )
+
+            try:
+                # the search table doesn't store a copy of the names, it reads them
+                # from the original table
+                self.cursor.execute(
+                    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {search_table_name}
+                        USING fts5(
+                            name,
+                            content='{table_name}',
+                            content_rowid='{id_column_name}',
+                            tokenize='trigram'
+                        )"""
+                )
+            except sqlite3.OperationalError: # FTS5 or the trigram tokenizer unavailable
+                self.name_search_enabled = False
+                return
+
+            self.cursor.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {search_table_name}Insert
+                    AFTER INSERT ON {table_name}
+                    BEGIN
+                        INSERT INTO {search_table_name}(rowid, name)
+                        VALUES (new.{id_column_name}, new.name);
+                    END"""
+            )
+            self.cursor.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {search_table_name}Delete
+                    AFTER DELETE ON {table_name}
+                    BEGIN
+                        INSERT INTO {search_table_name}({search_table_name}, rowid, name)
+                        VALUES ('delete', old.{id_column_name}, old.name);
+                    END"""
+            )
+            self.cursor.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {search_table_name}Update
+                    AFTER UPDATE OF name ON {table_name}
+                    BEGIN
+                        INSERT INTO {search_table_name}({search_table_name}, rowid, name)
+                        VALUES ('delete', old.{id_column_name}, old.name);
+                        INSERT INTO {search_table_name}(rowid, name)
+                        VALUES (new.{id_column_name}, new.name);
+                    END"""
+            )
+
+            # index any rows which were added before the search table existed
+            if is_new_search_table:
+                self.cursor.execute(
+                    f"INSERT INTO {search_table_name}({search_table_name}) VALUES ('rebuild')"
+                )
+
     def insert_data(self, table_name, data_row):
         """
         Inserts a single row of data to a table.
         User must not be able to type in table_name directly as SQL injection placeholder
         doesn't work with table names - table_name must be picked from drop-down list
         """
+        insert_str = self._create_insert_query(table_name, len(data_row))
+
+        with self.write_transaction() as cursor:
+            cursor.execute(insert_str, data_row)
+
+    def insert_many(self, table_name, data_rows):
+        """
+        Inserts many rows of data to a table in a single transaction, so either all of
+        the rows are inserted or none of them are. If any of the rows have a name which
+        is already in use, a DuplicateNameError is raised which lists the offending rows.
+        As with insert_data(), table_name must not be typed in directly by the user.
+        """
+        if len(data_rows) == 0:
+            return
+
+        insert_str = self._create_insert_query(table_name, len(data_rows[0]))
+
+        try:
+            with self.write_transaction():
+                self.cursor.executemany(insert_str, data_rows)
+        except sqlite3.IntegrityError as error:
+            if table_name == "MadeUsing": # this table doesn't have a name column
+                raise
+
+            # the name is always the first value in the row
+            names = [row[0] for row in data_rows]
+            self._raise_if_duplicate_names(table_name, names, error)
+            raise
+
+    def _create_insert_query(self, table_name, num_values):
+        """
+        Creates the INSERT query for a row with the given number of values, for use by
+        insert_data() and insert_many()
+        """
         # confirms table name is protected against SQL injection
         self.validate_table_name(table_name)
 
@@ -89,7 +604,7 @@ class DatabaseManager:
         #being inserted into, the number of question marks in the insertion
         #string must also vary
         question_mark_str = "?"
-        for _ in range(len(data_row) - 1):
+        for _ in range(num_values - 1):
             question_mark_str += ", ?"
 
         #we use NULL as the first value so that the primary key is auto incremented
@@ -98,10 +613,25 @@ class DatabaseManager:
         if table_name != "MadeUsing":
             question_mark_str = "NULL, " + question_mark_str
 
-        insert_str = f"INSERT INTO {table_name} VALUES ({question_mark_str})"
-        self.cursor.execute(insert_str, data_row)
+        return f"INSERT INTO {table_name} VALUES ({question_mark_str})"
 
-        self.connection.commit()
+    def _raise_if_duplicate_names(self, table_name, names, original_error):
+        """
+        Raises a DuplicateNameError if any of the names are repeated or are already in
+        the given table. Should be called after a bulk insert has been rolled back, so
+        that the names already in the table are the ones from before the insert.
+        """
+        existing_names = self._view_ids_from_names(table_name, names).keys()
+        seen_names = set()
+        colliding_rows = []
+
+        for row_index, name in enumerate(names):
+            if name in existing_names or name in seen_names:
+                colliding_rows.append((row_index, name))
+            seen_names.add(name)
+
+        if colliding_rows:
+            raise DuplicateNameError(colliding_rows) from original_error
 
     def build_where_clause(self, db_col_name, query_vals, query_value, like=False):
         """
@@ -125,17 +655,36 @@ class DatabaseManager:
 
         return clause
 
+    def build_name_search_clause(self, db_col_name, query_vals, query_value):
+        """
+        Creates the step of the WHERE clause that searches for names containing the
+        query_value. The full-text search index is used if it's available (see
+        create_name_search_tables()), which gives the same results as using LIKE
+        directly on the name column but without scanning the whole table.
+        """
+        if not self.name_search_enabled:
+            return self.build_where_clause(db_col_name, query_vals, query_value, like=True)
+
+        table_name = db_col_name.split(".")[0] # e.g. "Product.name" -> "Product"
+        id_column_name = self.ID_COLUMN_NAMES[table_name]
+        clause = (
+            f"{table_name}.{id_column_name} IN "
+            f"(SELECT rowid FROM {table_name}NameSearch WHERE name LIKE ?) AND "
+        )
+        query_vals.append(f"%{query_value}%")
+
+        return clause
+
     def _view_filtered_items(
         self,
         params_with_db_cols,
         query_without_where_clause,
+        order_by_db_cols,
         name_search=None,
-        design=None,
-        design_theme=None,
-        product_type=None,
-        subtype=None,
-        colour=None,
-        stock_level=None
+        order_by=None,
+        limit=None,
+        after_key=None,
+        include_total_count=False
     ):
         """
         Queries the database for products/components.
@@ -151,23 +700,75 @@ class DatabaseManager:
             if param:
                 if param is name_search:
                     where_clauses.append(
-                        self.build_where_clause(db_column, query_vals, param, like=True)
+                        self.build_name_search_clause(db_column, query_vals, param)
                     )
                 else:
                     where_clauses.append(
                         self.build_where_clause(db_column, query_vals, param)
                     )
 
+        # sqlite treats a negative limit as no limit, and there is no next page to carry
+        # on from after an empty one
+        if limit is not None and limit < 1:
+            raise sqlite3.DataError(f"Limit {limit} not valid, it must be at least 1")
+
+        # without an order there is no "after" to carry on from
+        if after_key is not None and limit is None and order_by is None:
+            raise sqlite3.DataError("after_key can only be used with order_by or limit")
+
+        # pages of results must be in a consistent order
+        if limit is not None and order_by is None:
+            order_by = "id"
+
+        if order_by is not None and order_by not in order_by_db_cols:
+            raise sqlite3.DataError(f"Can't order by {order_by}")
+
+        # counted before the after_key clause is added, so it's the total over all pages
+        total_count = None
+        if include_total_count:
+            count_query = "SELECT COUNT(*) FROM (" + product_query
+            if where_clauses:
+                count_query += " WHERE " + "".join(where_clauses)[:-4]
+            count_query += ")"
+            total_count = self.execute_query_and_list_results(
+                count_query, query_vals, single_column_index=0
+            )[0]
+
+        if order_by is not None:
+            order_by_db_col, order_by_row_index = order_by_db_cols[order_by]
+
+            # keyset pagination - carries on from the last row of the previous page
+            # rather than using OFFSET, which would have to step over all the
+            # previous pages' rows
+            if after_key is not None:
+                where_clauses.append(f"{order_by_db_col} > ? AND ")
+                query_vals.append(after_key)
+
         if where_clauses:
             product_query += " WHERE " + "".join(where_clauses)
             product_query = product_query[:-4] #remove final " AND"
 
-        return_list = self.execute_query_and_list_results(product_query, query_vals)
-        column_names = self.get_column_names_most_recent_query()
+        if order_by is not None:
+            product_query += f" ORDER BY {order_by_db_col}"
+
+        if limit is not None:
+            product_query += " LIMIT ?"
+            query_vals.append(limit)
+
+        results = self.execute_query_with_column_names(product_query, query_vals)
+        return_list = results["data"]
+
+        # the key to pass as after_key to get the next page - None if there are no
+        # more pages
+        next_key = None
+        if limit is not None and len(return_list) == limit:
+            next_key = return_list[-1][order_by_row_index]
 
         return {
-            "column_names": column_names,
-            "data": return_list
+            "column_names": results["column_names"],
+            "data": return_list,
+            "next_key": next_key,
+            "total_count": total_count
         }
 
     def view_filtered_products(
@@ -178,12 +779,34 @@ class DatabaseManager:
         product_type=None,
         subtype=None,
         colour=None,
-        stock_level=None
+        stock_level=None,
+        order_by=None,
+        limit=None,
+        after_key=None,
+        include_total_count=False
     ):
-        """Searches the database for products based on the provided filters"""
+        """
+        Searches the database for products based on the provided filters.
+        The results can be split into pages of at most 'limit' rows (at least 1). The
+        returned dictionary's 'next_key' should be passed as after_key to get the next
+        page, and is None once there are no more pages. order_by can be either "id" or
+        "name" (the default is "id" if a limit is given, otherwise the results are
+        unordered, so after_key can't be used).
+        include_total_count=True also returns the total number of matching products,
+        ignoring the limit, as 'total_count'.
+        The last column is how many of each product can be made from the components in
+        stock (see view_buildable_quantities()).
+        """
         product_query = """SELECT Product.product_id, Product.name AS 'Product Name', Product.colour,
                                   Product.stock, Product.low_stock_warning, Design.name AS 'Design Name',
-                                  Design.theme, ProductType.type, ProductType.sub_type
+                                  Design.theme, ProductType.type, ProductType.sub_type,
+                                  (
+                                      SELECT MAX(0, MIN(Component.stock / MadeUsing.num_components_used))
+                                      FROM MadeUsing
+                                      JOIN Component
+                                      ON MadeUsing.component_id=Component.component_id
+                                      WHERE MadeUsing.product_id=Product.product_id
+                                  ) AS buildable_quantity
                            FROM Product
                            JOIN Design
                            ON Product.design_id=Design.design_id
@@ -199,37 +822,234 @@ class DatabaseManager:
             (colour, "Product.colour"),
             (stock_level, "Product.stock")
         )
+        # the column to order by for each order_by option, and its index in a row
+        order_by_db_cols = {"id": ("Product.product_id", 0), "name": ("Product.name", 1)}
 
         return self._view_filtered_items(
             params_with_db_cols,
             product_query,
-            name_search, design,
-            design_theme,
-            product_type,
-            subtype,
-            stock_level
+            order_by_db_cols,
+            name_search,
+            order_by,
+            limit,
+            after_key,
+            include_total_count
         )
 
-    def view_filtered_components(self, name_search=None, stock_level=None):
-        """Searches the database for components based on the provided filters"""
+    def view_filtered_components(
+        self,
+        name_search=None,
+        stock_level=None,
+        order_by=None,
+        limit=None,
+        after_key=None,
+        include_total_count=False
+    ):
+        """
+        Searches the database for components based on the provided filters. See
+        view_filtered_products() for how to use the other parameters.
+        """
         product_query = """SELECT *
                            FROM Component"""
         params_with_db_cols = (
             (name_search, "Component.name"), (stock_level, "Component.stock")
         )
+        # the column to order by for each order_by option, and its index in a row
+        order_by_db_cols = {
+            "id": ("Component.component_id", 0), "name": ("Component.name", 1)
+        }
 
         return self._view_filtered_items(
-            params_with_db_cols, product_query, name_search, stock_level
+            params_with_db_cols,
+            product_query,
+            order_by_db_cols,
+            name_search,
+            order_by,
+            limit,
+            after_key,
+            include_total_count
+        )
+
+    def view_buildable_quantities(self):
+        """
+        Returns how many of each product can be made from the components currently in
+        stock, i.e. for each product the lowest (component stock // number of that
+        component used) of all its components. The quantity is None for products which
+        aren't made using any components.
+        """
+        # stock and num_components_used are integers, so / is integer division
+        query = """SELECT Product.product_id, Product.name,
+                          MAX(0, MIN(Component.stock / MadeUsing.num_components_used))
+                              AS buildable_quantity
+                   FROM Product
+                   LEFT JOIN MadeUsing
+                   ON MadeUsing.product_id=Product.product_id
+                   LEFT JOIN Component
+                   ON MadeUsing.component_id=Component.component_id
+                   GROUP BY Product.product_id"""
+
+        return self.execute_query_with_column_names(query)
+
+    def view_sales_velocity(self, products=True, components=True):
+        """
+        Gets how many of each item have been used per day (sold, or removed from stock
+        in any other way) over each of the SALES_VELOCITY_WINDOWS, and the number of
+        days until the item runs out at the DAYS_OF_COVER_WINDOW rate. Days of cover is
+        None for items which haven't been used in that window. The parameters
+        'products' and 'components' allow only one or both tables to be searched, and
+        the last column is the item type ('Product' or 'Component').
+        """
+        return self.execute_query_with_column_names(
+            self._create_sales_velocity_query(products, components)
+        )
+
+    def _create_sales_velocity_query(self, products, components):
+        """
+        Builds the query for view_sales_velocity(). Each item's recent stock decrements
+        are read from StockMovementItemTimeIndex and added up for all of the windows in
+        one pass, rather than querying each item or window separately.
+        """
+        window_start = self._create_window_start_sql
+
+        def units_used(days):
+            # 0 for items without any recent movements, as the LEFT JOIN gives NULLs
+            return f"""SUM(CASE WHEN StockMovement.moved_at >= {window_start(days)}
+                                THEN -StockMovement.change ELSE 0 END)"""
+
+        velocity_columns = ", ".join(
+            f"ROUND({units_used(days)} / {days}.0, 2) AS units_per_day_last_{days}_days"
+            for days in self.SALES_VELOCITY_WINDOWS
         )
+        cover_days = self.DAYS_OF_COVER_WINDOW
+
+        def create_query(table_name):
+            id_column_name = self.ID_COLUMN_NAMES[table_name]
+            return f"""SELECT {table_name}.name, {table_name}.stock,
+                              {table_name}.low_stock_warning, {velocity_columns},
+                              CASE
+                                  WHEN {table_name}.stock <= 0 THEN 0
+                                  WHEN {units_used(cover_days)} > 0
+                                  THEN ROUND(
+                                      {table_name}.stock * {cover_days}.0
+                                      / {units_used(cover_days)},
+                                      1
+                                  )
+                              END AS days_of_cover,
+                              '{table_name}' AS item_type
+                       FROM {table_name}
+                       -- the item's latest opening movement, where its history starts
+                       LEFT JOIN StockMovement AS Opening
+                       ON Opening.item_type='{table_name}'
+                       AND Opening.item_id={table_name}.{id_column_name}
+                       AND Opening.reason='opening stock'
+                       AND NOT EXISTS (
+                           SELECT *
+                           FROM StockMovement AS LaterOpening
+                           WHERE LaterOpening.item_type='{table_name}'
+                           AND LaterOpening.item_id={table_name}.{id_column_name}
+                           AND LaterOpening.reason='opening stock'
+                           AND LaterOpening.movement_id > Opening.movement_id
+                       )
+                       LEFT JOIN StockMovement
+                       ON StockMovement.item_type='{table_name}'
+                       AND StockMovement.item_id={table_name}.{id_column_name}
+                       AND StockMovement.moved_at >= {window_start(max(self.SALES_VELOCITY_WINDOWS))}
+                       AND StockMovement.change < 0
+                       AND StockMovement.movement_id > IFNULL(Opening.movement_id, 0)
+                       GROUP BY {table_name}.{id_column_name}"""
+
+        item_queries = [
+            create_query(table_name)
+            for table_name, included in (("Product", products), ("Component", components))
+            if included
+        ]
+
+        return " UNION ALL ".join(item_queries)
 
-    def view_low_stock_items(self, products=True, components=True):
+    def _create_window_start_sql(self, days):
+        """
+        Returns the SQL for the timestamp the given number of days ago. It is a subquery
+        so that it is only worked out once per query rather than for every row.
+        """
+        return f"(SELECT strftime('%Y-%m-%d %H:%M:%f', 'now', '-{days} days'))"
+
+    def _create_opening_movement_id_sql(self, table_name, item_id_sql):
+        """
+        Returns the SQL for the ID of the item's latest 'opening stock' movement (or 0
+        if it doesn't have one), which is where the item's history starts. Movements
+        before it belong to a deleted item which had the same ID.
+        """
+        return f"""(SELECT IFNULL(MAX(movement_id), 0)
+                    FROM StockMovement AS Opening
+                    WHERE Opening.item_type = '{table_name}'
+                    AND Opening.item_id = {item_id_sql}
+                    AND Opening.reason = 'opening stock')"""
+
+    def _create_days_of_cover_sql(self, table_name):
+        """
+        Returns the SQL for an item's days of cover (see view_sales_velocity()) which
+        only reads that item's recent movements, for queries of a few items
+        """
+        id_column_name = self.ID_COLUMN_NAMES[table_name]
+        cover_days = self.DAYS_OF_COVER_WINDOW
+        # NULL when nothing has been used, so that days of cover is None
+        units_used = f"""NULLIF((
+                             SELECT SUM(-change)
+                             FROM StockMovement
+                             WHERE item_type = '{table_name}'
+                             AND item_id = {table_name}.{id_column_name}
+                             AND moved_at >= {self._create_window_start_sql(cover_days)}
+                             AND change < 0
+                             AND movement_id > {self._create_opening_movement_id_sql(
+                                 table_name, f"{table_name}.{id_column_name}"
+                             )}
+                         ), 0)"""
+
+        return f"""CASE
+                       WHEN {table_name}.stock <= 0 THEN 0
+                       ELSE ROUND({table_name}.stock * {cover_days}.0 / {units_used}, 1)
+                   END"""
+
+    def view_low_stock_items(
+        self,
+        products=True,
+        components=True,
+        include_days_of_cover=False,
+        predicted_low_days=None
+    ):
         """
         Gets the items which have a stock level equal or less than their warning level.
         The parameters 'products' and 'components' allow only one or both tables to
-        be searched.
+        be searched. The last column is the item type ('Product' or 'Component'), so
+        that a product and a component with the same name are both included.
+        The items are read from the LOW_STOCK_INDEXES, so the time taken depends on the
+        number of low stock items rather than the number of items.
+        include_days_of_cover=True adds a days_of_cover column before the item type,
+        which is only worked out for the low stock items.
+        If predicted_low_days is given, the items which aren't low on stock yet but are
+        predicted to run out within that many days (see view_sales_velocity()) are
+        returned instead, along with their days_of_cover. This has to work out the
+        sales velocity of every item so the indexes can't be used, and should be run
+        less often than the other queries.
         """
+        if predicted_low_days is not None:
+            velocity_query = self._create_sales_velocity_query(products, components)
+            query = f"""SELECT name, stock, low_stock_warning, days_of_cover, item_type
+                        FROM ({velocity_query})
+                        WHERE stock > low_stock_warning
+                        AND days_of_cover <= ?"""
+
+            return self.execute_query_with_column_names(query, (predicted_low_days,))
+
         def create_query(table_name):
-            return f"""SELECT name, stock, low_stock_warning
+            days_of_cover_column = ""
+            if include_days_of_cover:
+                days_of_cover_column = (
+                    self._create_days_of_cover_sql(table_name) + " AS days_of_cover, "
+                )
+
+            return f"""SELECT name, stock, low_stock_warning, {days_of_cover_column}
+                              '{table_name}' AS item_type
                        FROM {table_name}
                        WHERE stock <= low_stock_warning"""
 
@@ -242,21 +1062,13 @@ class DatabaseManager:
         for item, query in items_and_queries:
             if item:
                 if len(full_query) > 0:
-                    full_query += " UNION "
+                    # the item types are different so there are no duplicates to
+                    # remove, which UNION would sort the rows to find
+                    full_query += " UNION ALL "
 
                 full_query += query
 
-        return_list = self.execute_query_and_list_results(full_query)
-        column_names = self.get_column_names_most_recent_query()
-
-        return {
-            "column_names": column_names,
-            "data": return_list
-        }
-
-    def get_column_names_most_recent_query(self):
-        """Retrieves the column names from the most recently performed database query"""
-        return [col[0] for col in self.cursor.description]
+        return self.execute_query_with_column_names(full_query)
 
     def view_single_column_from_single_table(
         self,
@@ -345,40 +1157,140 @@ class DatabaseManager:
         low_stock_warning,
         components
     ):
-        # obtain design and product type IDs
-        design_id = self.view_single_column_from_single_table_with_where_clause(
-            "design_id",
-            "Design",
-            "name",
-            design
+        """
+        Inserts a new product, as well as the rows in MadeUsing which link it to its
+        components. This is done in a single transaction using the same number of
+        queries no matter how many components the product is made with.
+        """
+        # obtain design and product type IDs in a single query
+        ids_query = """SELECT (SELECT design_id FROM Design WHERE name = ?),
+                              (SELECT product_type_id FROM ProductType WHERE name = ?)"""
+        design_id, product_type_id = self.execute_query_and_list_results(
+            ids_query, (design, product_type)
         )[0] # [0] because a list is returned by the function
-        product_type_id = self.view_single_column_from_single_table_with_where_clause(
-            "product_type_id", "ProductType", "name", product_type
-        )[0]
 
-        #add the record to Product
-        self.insert_data(
-            "Product",
-            [name, colour, stock, low_stock_warning, design_id, product_type_id]
-        )
+        if design_id is None or product_type_id is None:
+            raise sqlite3.DataError(
+                f"Design {design} or product type {product_type} doesn't exist"
+            )
 
-        #add any records to MadeUsing
-        for component_name, quantity in components:
-            product_id = self.view_single_column_from_single_table_with_where_clause(
-                "product_id", "Product", "name", name
-            )[0]
-            component_id = self.view_single_column_from_single_table_with_where_clause(
-                "component_id", "Component", "name", component_name
-            )[0]
-            self.insert_data("MadeUsing", [product_id, component_id, quantity])
+        with self.write_transaction():
+            #add the record to Product
+            self.cursor.execute(
+                self._create_insert_query("Product", 6),
+                [name, colour, stock, low_stock_warning, design_id, product_type_id]
+            )
+            product_id = self.cursor.lastrowid
+
+            #add any records to MadeUsing
+            if components:
+                self._insert_components_of_product(product_id, components)
+
+    def _insert_components_of_product(self, product_id, components):
+        """
+        Adds the MadeUsing rows for a product in one query, looking up the component
+        IDs from their names as part of the insert. components is a list of
+        (component name, quantity) tuples. Doesn't commit, so should be called inside
+        a transaction.
+        """
+        values_str = ", ".join(["(?, ?)"] * len(components))
+        # the columns of a VALUES table are named column1, column2 etc. by sqlite - in
+        # this case they are the component name and quantity
+        query = f"""INSERT INTO MadeUsing (product_id, component_id, num_components_used)
+                    SELECT ?, Component.component_id, UsedComponent.column2
+                    FROM (VALUES {values_str}) AS UsedComponent
+                    JOIN Component
+                    ON Component.name = UsedComponent.column1"""
+        parameters = [product_id]
+        parameters.extend(value for component in components for value in component)
+        self.cursor.execute(query, parameters)
+
+        # any component names that don't exist won't have been inserted
+        if self.cursor.rowcount != len(components):
+            raise sqlite3.DataError(
+                f"Not all of the components {components} exist"
+            )
+
+    def insert_new_products_bulk(self, products):
+        """
+        Inserts many products, and the rows in MadeUsing linking them to their
+        components, in a single transaction. Each product is a tuple of the same
+        arguments that insert_new_product() takes i.e. (name, design, colour,
+        product_type, stock, low_stock_warning, components). If any of the product names
+        are already in use, a DuplicateNameError is raised and nothing is inserted.
+        """
+        if len(products) == 0:
+            return
+
+        # look up all the IDs at once rather than once per product
+        design_ids = self._view_ids_from_names(
+            "Design", [product[1] for product in products]
+        )
+        product_type_ids = self._view_ids_from_names(
+            "ProductType", [product[3] for product in products]
+        )
+        component_ids = self._view_ids_from_names(
+            "Component",
+            [component[0] for product in products for component in product[6]]
+        )
 
-    def _update_item_stock_level(self, item_id, table_name, increase_decrease_amount):
+        product_rows = []
+        for name, design, colour, product_type, stock, low_stock_warning, _ in products:
+            try:
+                product_rows.append([
+                    name,
+                    colour,
+                    stock,
+                    low_stock_warning,
+                    design_ids[design],
+                    product_type_ids[product_type]
+                ])
+            except KeyError as error:
+                raise sqlite3.DataError(
+                    f"Design or product type {error} of product {name} doesn't exist"
+                ) from None
+
+        product_names = [product[0] for product in products]
+        product_insert_str = self._create_insert_query("Product", 6)
+        made_using_insert_str = self._create_insert_query("MadeUsing", 3)
+
+        try:
+            with self.write_transaction():
+                self.cursor.executemany(product_insert_str, product_rows)
+                product_ids = self._view_ids_from_names("Product", product_names)
+
+                made_using_rows = []
+                for product_name, *_, components in products:
+                    for component_name, quantity in components:
+                        made_using_rows.append([
+                            product_ids[product_name],
+                            component_ids[component_name],
+                            quantity
+                        ])
+
+                self.cursor.executemany(made_using_insert_str, made_using_rows)
+        except sqlite3.IntegrityError as error:
+            self._raise_if_duplicate_names("Product", product_names, error)
+            raise
+        except KeyError as error:
+            raise sqlite3.DataError(f"Component {error} doesn't exist") from None
+
+    def _update_item_stock_level(
+        self,
+        item_id,
+        table_name,
+        increase_decrease_amount,
+        reason="adjustment"
+    ):
         """
         Increases or decreases the stock level of the given item by the sepcified
         amount, e.g. if the current stock level is 5 and increase_decrease_amount is -1,
         then the new stock level will be 4.
         This method shouldn't be called directly, rather either
         update_product_stock_level() or update_component_stock_level() should be called.
+        Returns the item in a list if it has just become low on stock, otherwise an
+        empty list - see _view_low_stock_crossings(). The change is recorded in the
+        stock history with the given reason.
         """
         # confirms table name is protected against SQL injection
         self.validate_table_name(table_name)
@@ -389,25 +1301,362 @@ class DatabaseManager:
         update_sql = f"""UPDATE {table_name}
                          SET stock = stock + ?
                          WHERE {id_column_name} = ?"""
-        self.cursor.execute(update_sql, (increase_decrease_amount, item_id))
-        self.connection.commit()
 
-    def update_product_stock_level(self, product_id, increase_decrease_amount):
+        with self.write_transaction():
+            self._clear_low_stock_crossings()
+            last_movement_id = self._view_last_movement_id()
+            self.cursor.execute(update_sql, (increase_decrease_amount, item_id))
+            self._set_stock_movement_reason(reason, last_movement_id)
+            self._take_stock_snapshot_if_due()
+            return self._view_low_stock_crossings()
+
+    def update_product_stock_level(
+        self,
+        product_id,
+        increase_decrease_amount,
+        reason="adjustment"
+    ):
         """
         Updates the stock level of a product - note that the new stock level is
         NOT increase_decrease_amount, this is how much the previous stock level is
-        changed by
+        changed by. Returns the product in a list if it has just become low on stock.
         """
-        self._update_item_stock_level(product_id, "Product", increase_decrease_amount)
+        return self._update_item_stock_level(
+            product_id, "Product", increase_decrease_amount, reason
+        )
 
-    def update_component_stock_level(self, component_id, increase_decrease_amount):
+    def update_component_stock_level(
+        self,
+        component_id,
+        increase_decrease_amount,
+        reason="adjustment"
+    ):
         """
         Updates the stock level of an item - note that the new stock level is
         NOT increase_decrease_amount, this is how much the previous stock level is
-        changed by
+        changed by. Returns the component in a list if it has just become low on stock.
         """
-        self._update_item_stock_level(
-            component_id, "Component", increase_decrease_amount
+        return self._update_item_stock_level(
+            component_id, "Component", increase_decrease_amount, reason
+        )
+
+    def sell_product(self, product_id, quantity):
+        """
+        Reduces the stock level of the product by quantity, and the stock level of each
+        component used to make it by quantity multiplied by the number of that component
+        the product uses. Both updates happen in a single transaction, so the component
+        stock levels are never changed without the product's (or vice versa).
+        Returns the items which have just become low on stock.
+        """
+        update_product_sql = """UPDATE Product
+                                SET stock = stock - ?
+                                WHERE product_id = ?"""
+        # one UPDATE for all of the product's components
+        update_components_sql = """UPDATE Component
+                                   SET stock = stock - ? * (
+                                       SELECT num_components_used
+                                       FROM MadeUsing
+                                       WHERE MadeUsing.product_id = ?
+                                       AND MadeUsing.component_id = Component.component_id
+                                   )
+                                   WHERE component_id IN (
+                                       SELECT component_id
+                                       FROM MadeUsing
+                                       WHERE product_id = ?
+                                   )"""
+
+        with self.write_transaction():
+            self._clear_low_stock_crossings()
+            last_movement_id = self._view_last_movement_id()
+            self.cursor.execute(update_product_sql, (quantity, product_id))
+
+            if self.cursor.rowcount == 0:
+                raise sqlite3.DataError(f"Product {product_id} doesn't exist")
+
+            self.cursor.execute(
+                update_components_sql, (quantity, product_id, product_id)
+            )
+            self._set_stock_movement_reason("sale", last_movement_id)
+            self._take_stock_snapshot_if_due()
+            return self._view_low_stock_crossings()
+
+    def apply_orders(self, order_lines):
+        """
+        Sells the products in many orders at once, e.g. a batch of orders exported from
+        Etsy. order_lines is a list of (product name, quantity) tuples - a product can
+        appear in more than one line. The quantities are totalled per product, and each
+        component's stock level is reduced by the total number of it used in all the
+        sold products, all in a single transaction. Raises sqlite3.DataError (and
+        changes nothing) if any of the products don't exist.
+        Returns a dictionary of the IDs of the products and components whose stock
+        levels changed, the items which have just become low on stock, and all the low
+        stock items after the orders have been applied.
+        """
+        quantities_by_name = {}
+        for product_name, quantity in order_lines:
+            quantities_by_name[product_name] = (
+                quantities_by_name.get(product_name, 0) + quantity
+            )
+
+        product_ids_by_name = self._view_ids_from_names("Product", quantities_by_name)
+        unknown_names = set(quantities_by_name) - set(product_ids_by_name)
+        if unknown_names:
+            raise sqlite3.DataError(f"Product(s) don't exist: {sorted(unknown_names)}")
+
+        quantities_by_id = {
+            product_ids_by_name[product_name]: quantity
+            for product_name, quantity in quantities_by_name.items()
+        }
+        update_products_sql = """UPDATE Product
+                                 SET stock = stock - ?
+                                 WHERE product_id = ?"""
+        # every component used by the sold products, with the total number used
+        update_components_sql = """UPDATE Component
+                                   SET stock = stock - (
+                                       SELECT SUM(
+                                           ProductQuantity.quantity
+                                           * MadeUsing.num_components_used
+                                       )
+                                       FROM ProductQuantity
+                                       JOIN MadeUsing
+                                       ON MadeUsing.product_id = ProductQuantity.product_id
+                                       WHERE MadeUsing.component_id = Component.component_id
+                                   )
+                                   WHERE component_id IN (
+                                       SELECT MadeUsing.component_id
+                                       FROM ProductQuantity
+                                       JOIN MadeUsing
+                                       ON MadeUsing.product_id = ProductQuantity.product_id
+                                   )"""
+        changed_component_ids_query = """SELECT DISTINCT MadeUsing.component_id
+                                         FROM ProductQuantity
+                                         JOIN MadeUsing
+                                         ON MadeUsing.product_id = ProductQuantity.product_id"""
+
+        with self.write_transaction():
+            self._clear_low_stock_crossings()
+            last_movement_id = self._view_last_movement_id()
+            self.cursor.executemany(
+                update_products_sql,
+                [(quantity, product_id) for product_id, quantity in quantities_by_id.items()]
+            )
+            self._fill_product_quantity_table(quantities_by_id)
+            self.cursor.execute(update_components_sql)
+            self._set_stock_movement_reason("order", last_movement_id)
+            changed_component_ids = self.execute_query_and_list_results(
+                changed_component_ids_query, single_column_index=0
+            )
+            self._take_stock_snapshot_if_due()
+            low_stock_crossings = self._view_low_stock_crossings()
+
+        return {
+            "product_ids": list(quantities_by_id),
+            "component_ids": changed_component_ids,
+            "low_stock_crossings": low_stock_crossings,
+            "low_stock_items": self.view_low_stock_items()
+        }
+
+    def plan_component_requirements(self, quantities_by_product_id):
+        """
+        Works out the components needed to make a production run, given as a dictionary
+        of product IDs and the quantity of each to make. Returns a row for each
+        component used, with the total number required, the number in stock, and the
+        shortfall (how many more are needed, or 0 if there are enough in stock).
+        Raises sqlite3.DataError if any of the products don't exist.
+        """
+        unknown_product_ids_query = """SELECT product_id
+                                       FROM ProductQuantity
+                                       WHERE product_id NOT IN (SELECT product_id FROM Product)"""
+        # the requirements are totalled in one grouped join, however many products
+        # there are
+        requirements_query = """SELECT component_id, name, required, on_hand,
+                                       MAX(0, required - on_hand) AS shortfall
+                                FROM (
+                                    SELECT Component.component_id, Component.name,
+                                           SUM(
+                                               ProductQuantity.quantity
+                                               * MadeUsing.num_components_used
+                                           ) AS required,
+                                           Component.stock AS on_hand
+                                    FROM ProductQuantity
+                                    JOIN MadeUsing
+                                    ON MadeUsing.product_id=ProductQuantity.product_id
+                                    JOIN Component
+                                    ON Component.component_id=MadeUsing.component_id
+                                    GROUP BY Component.component_id
+                                )
+                                ORDER BY component_id"""
+
+        # the temporary table is only changed for this query, so nothing is saved
+        with self.write_transaction():
+            self._fill_product_quantity_table(quantities_by_product_id)
+            unknown_product_ids = self.execute_query_and_list_results(
+                unknown_product_ids_query, single_column_index=0
+            )
+            if unknown_product_ids:
+                raise sqlite3.DataError(
+                    f"Product(s) don't exist: {sorted(unknown_product_ids)}"
+                )
+
+            return self.execute_query_with_column_names(requirements_query)
+
+    def _clear_low_stock_crossings(self):
+        """
+        Empties the temporary LowStockCrossing table, so that afterwards it only holds
+        the items which become low on stock from the next update
+        """
+        self.cursor.execute("DELETE FROM LowStockCrossing")
+
+    def _view_low_stock_crossings(self):
+        """
+        Returns the items which have become low on stock since
+        _clear_low_stock_crossings() was called, as a list of (item type, item ID, name,
+        stock, low stock warning) tuples
+        """
+        query = """SELECT item_type, item_id, name, stock, low_stock_warning
+                   FROM LowStockCrossing
+                   ORDER BY rowid"""
+
+        return self.execute_query_and_list_results(query)
+
+    def _view_last_movement_id(self):
+        """
+        Returns the ID of the latest stock movement, or 0 if there aren't any. This is
+        read inside the stock update's write_transaction(), after
+        _clear_low_stock_crossings() has started the transaction, so if another
+        connection adds movements before the stock is updated, sqlite stops the update
+        rather than those movements being given the update's reason.
+        """
+        return self.execute_query_and_list_results(
+            "SELECT IFNULL(MAX(movement_id), 0) FROM StockMovement", single_column_index=0
+        )[0]
+
+    def _set_stock_movement_reason(self, reason, last_movement_id):
+        """
+        Records the reason for the stock movements after last_movement_id (see
+        _view_last_movement_id()), which the triggers write without a reason. Only the
+        primary key is searched, so just the new movements are read.
+        """
+        self.cursor.execute(
+            """UPDATE StockMovement
+               SET reason = ?
+               WHERE movement_id > ? AND reason IS NULL""",
+            (reason, last_movement_id)
+        )
+
+    def take_stock_snapshot(self, all_items=False):
+        """
+        Records the current stock level of each item which has moved since the previous
+        snapshot in StockSnapshot, along with the ID of the latest stock movement, so
+        that view_stock_as_of() can start from the item's latest snapshot rather than
+        adding up every movement since the beginning. Only snapshotting the items which
+        have moved keeps the snapshots in proportion to the number of movements rather
+        than the number of items. all_items=True snapshots every item, for the stock
+        levels from before there was a stock history.
+        """
+        def create_query(table_name):
+            id_column_name = self.ID_COLUMN_NAMES[table_name]
+            query = f"""SELECT '{table_name}', {id_column_name}, stock, last_movement.id
+                        FROM {table_name}, (
+                            SELECT IFNULL(MAX(movement_id), 0) AS id FROM StockMovement
+                        ) AS last_movement"""
+
+            if not all_items:
+                # the + stops sqlite from looking up every one of the item type's
+                # movements in StockMovementItemIndex, so only the movements since the
+                # previous snapshot are read (using the primary key)
+                query += f"""
+                        WHERE {id_column_name} IN (
+                            SELECT item_id
+                            FROM StockMovement
+                            WHERE +item_type = '{table_name}'
+                            AND movement_id > (
+                                SELECT IFNULL(MAX(last_movement_id), 0) FROM StockSnapshot
+                            )
+                        )"""
+
+            return query
+
+        snapshot_sql = (
+            "INSERT INTO StockSnapshot (item_type, item_id, stock, last_movement_id) "
+            + create_query("Product")
+            + " UNION ALL "
+            + create_query("Component")
+        )
+
+        with self.write_transaction() as cursor:
+            cursor.execute(snapshot_sql)
+
+    def _take_stock_snapshot_if_due(self):
+        """
+        Takes a stock snapshot if there have been STOCK_SNAPSHOT_INTERVAL stock
+        movements since the last one (both MAX()s are read from indexes)
+        """
+        query = """SELECT (SELECT IFNULL(MAX(movement_id), 0) FROM StockMovement)
+                          - (SELECT IFNULL(MAX(last_movement_id), 0) FROM StockSnapshot)"""
+        num_movements_since_snapshot = self.execute_query_and_list_results(
+            query, single_column_index=0
+        )[0]
+
+        if num_movements_since_snapshot >= self.STOCK_SNAPSHOT_INTERVAL:
+            self.take_stock_snapshot()
+
+    def view_stock_as_of(self, item_type, item_id, timestamp):
+        """
+        Returns the stock level of the item ('Product' or 'Component' and its ID) at the
+        given UTC time, a string such as '2024-05-01 18:00:00'. The latest snapshot
+        taken at or before that time is used, plus the item's movements after it, so at
+        most STOCK_SNAPSHOT_INTERVAL movements are read. The latest snapshot is the one
+        with the highest last_movement_id, as taken_at can be the same for two
+        snapshots or go backwards if the clock is changed. Only the movements from the
+        item's latest 'opening stock' movement before that time are counted, so an item
+        doesn't inherit the history of a deleted item which had the same ID. Stock
+        levels from before the stock history was added to the database are only known
+        from the first snapshot onwards.
+        """
+        opening_query = """SELECT IFNULL(MAX(movement_id), 0)
+                           FROM StockMovement
+                           WHERE item_type = ? AND item_id = ?
+                           AND reason = 'opening stock' AND moved_at <= ?"""
+        opening_movement_id = self.execute_query_and_list_results(
+            opening_query, (item_type, item_id, timestamp), single_column_index=0
+        )[0]
+
+        snapshot_query = """SELECT stock, last_movement_id
+                            FROM StockSnapshot
+                            WHERE item_type = ? AND item_id = ? AND taken_at <= ?
+                            AND last_movement_id >= ?
+                            ORDER BY last_movement_id DESC
+                            LIMIT 1"""
+        snapshots = self.execute_query_and_list_results(
+            snapshot_query, (item_type, item_id, timestamp, opening_movement_id)
+        )
+        # without a snapshot, the movements are added up from the opening movement
+        stock, last_movement_id = (
+            snapshots[0] if snapshots else (0, opening_movement_id - 1)
+        )
+
+        movements_query = """SELECT IFNULL(SUM(change), 0)
+                             FROM StockMovement
+                             WHERE item_type = ? AND item_id = ? AND movement_id > ?
+                             AND moved_at <= ?"""
+        stock += self.execute_query_and_list_results(
+            movements_query,
+            (item_type, item_id, last_movement_id, timestamp),
+            single_column_index=0
+        )[0]
+
+        return stock
+
+    def _fill_product_quantity_table(self, quantities_by_product_id):
+        """
+        Replaces the contents of the temporary ProductQuantity table with the given
+        dictionary of product IDs and quantities
+        """
+        self.cursor.execute("DELETE FROM ProductQuantity")
+        self.cursor.executemany(
+            "INSERT INTO ProductQuantity (product_id, quantity) VALUES (?, ?)",
+            quantities_by_product_id.items()
         )
 
 
@@ -435,14 +1684,72 @@ class DatabaseManager:
     def delete_product(self, product_id):
         sql = f"""DELETE FROM Product
                   WHERE product_id = ?"""
-        self.cursor.execute(sql, (str(product_id),))
-        self.connection.commit()
+
+        with self.write_transaction() as cursor:
+            cursor.execute(sql, (str(product_id),))
 
     def delete_component(self, component_id):
         sql = f"""DELETE FROM Component
                   WHERE component_id = ?"""
-        self.cursor.execute(sql, (str(component_id),))
-        self.connection.commit()
+
+        with self.write_transaction() as cursor:
+            cursor.execute(sql, (str(component_id),))
+
+    def _view_ids_from_names(self, table_name, names):
+        """
+        Returns a dictionary of the given names that exist in the table, mapped to their
+        IDs. The names are looked up in chunks to stay within sqlite's limit on the
+        number of query parameters.
+        """
+        # confirms table name is protected against SQL injection
+        self.validate_table_name(table_name)
+        id_column_name = self.ID_COLUMN_NAMES[table_name]
+
+        unique_names = list(set(names))
+        ids_by_name = {}
+
+        for i in range(0, len(unique_names), self.MAX_QUERY_PARAMETERS):
+            names_chunk = unique_names[i:i + self.MAX_QUERY_PARAMETERS]
+            question_mark_str = ", ".join("?" * len(names_chunk))
+            query = f"""SELECT name, {id_column_name}
+                        FROM {table_name}
+                        WHERE name IN ({question_mark_str})"""
+            ids_by_name.update(self.execute_query_and_list_results(query, names_chunk))
+
+        return ids_by_name
+
+    def load_schema_cache(self):
+        """
+        Caches the table and column names, which are used as whitelists by
+        validate_table_name() and validate_column_names(). The schema version is stored
+        too so that the cache can be rebuilt if the schema is changed.
+        """
+        table_names = self._get_all_table_names()
+        all_column_names = []
+
+        for table_name in table_names:
+            cols_in_table = self.execute_query_and_list_results(
+                f"PRAGMA table_info({table_name})", single_column_index=1
+            )
+            all_column_names.extend(cols_in_table)
+
+        self.cached_table_names = frozenset(table_names)
+        self.cached_column_names = frozenset(all_column_names)
+        self.cached_schema_version = self._get_schema_version()
+
+    def _refresh_schema_cache_if_stale(self):
+        """Rebuilds the schema cache, but only if the schema has changed since it was built"""
+        if self._get_schema_version() != self.cached_schema_version:
+            self.load_schema_cache()
+
+    def _get_schema_version(self):
+        """
+        Returns the schema version number, which sqlite increments whenever the schema
+        is changed (e.g. a table is created)
+        """
+        return self.execute_query_and_list_results(
+            "PRAGMA schema_version", single_column_index=0
+        )[0]
 
     def validate_table_name(self, table_name_to_validate):
         """
@@ -450,9 +1757,9 @@ class DatabaseManager:
         This is necessary as sqlite3 only offers functionality to check column values,
         not table names.
         """
-        table_names = self._get_all_table_names()
+        self._refresh_schema_cache_if_stale()
 
-        if table_name_to_validate not in table_names:
+        if table_name_to_validate not in self.cached_table_names:
             raise sqlite3.DataError(f"Table name {table_name_to_validate} not valid!")
 
     def validate_column_names(self, column_names_to_validate):
@@ -461,25 +1768,34 @@ class DatabaseManager:
         column names. This is necessary as sqlite3 only offers functionality to check
         column values, not column names.
         """
-        table_names = self._get_all_table_names()
-        all_column_names = []
+        self._refresh_schema_cache_if_stale()
 
-        for table_name in table_names:
-            cols_in_table = self.execute_query_and_list_results(
-                f"PRAGMA table_info({table_name})", single_column_index=1
-            )
-            all_column_names.extend(cols_in_table)
-
-        #checks if all the column_names_to_validate are in all_column_names
+        #checks if all the column_names_to_validate are in the cached column names
         bad_column_names = [
-            col for col in column_names_to_validate if col not in all_column_names
+            col for col in column_names_to_validate
+            if col not in self.cached_column_names
         ]
         if len(bad_column_names) > 0:
             raise sqlite3.DataError(f"Column name(s) not valid: {bad_column_names}")
 
     def _get_all_table_names(self):
-        """Returns the names of all the tables in the database"""
-        sql_str = "SELECT name FROM sqlite_master WHERE type='table'"
+        """
+        Returns the names of all the tables in the database, other than the virtual
+        tables used for the full-text search indexes and the tables which sqlite uses to
+        store them (which are named after the virtual table e.g. ProductNameSearch_data)
+        """
+        # virtual tables are the only tables with a rootpage of 0
+        sql_str = """SELECT name
+                     FROM sqlite_master AS master
+                     WHERE type = 'table'
+                     AND rootpage != 0
+                     AND NOT EXISTS (
+                         SELECT *
+                         FROM sqlite_master AS virtual_table
+                         WHERE virtual_table.type = 'table'
+                         AND virtual_table.rootpage = 0
+                         AND master.name LIKE virtual_table.name || '!_%' ESCAPE '!'
+                     )"""
         table_names = self.execute_query_and_list_results(sql_str, single_column_index=0)
 
         return table_names
@@ -494,15 +1810,77 @@ class DatabaseManager:
         Executes a query and returns the results as a list. If a single_column_index is
         provided, only the values from that column will be added to the list.
         """
-        return_list = []
-        results = self.cursor.execute(query, parameters)
+        with self._read_connection() as connection:
+            # each query has its own cursor, so queries in other threads can't change
+            # its results
+            results = connection.execute(query, parameters)
+
+            if single_column_index is False:
+                return results.fetchall()
 
-        for row in results.fetchall():
-            row_to_add = row
+            # reads the rows straight from the cursor, rather than from a list of all the
+            # rows, so that the results aren't held in memory twice
+            return [row[single_column_index] for row in results]
+
+    def execute_query_with_column_names(self, query, parameters=()):
+        """
+        Executes a query and returns a dictionary of its column names and its results.
+        Both are read from the query's own cursor, so another query can't be run in
+        between.
+        """
+        with self._read_connection() as connection:
+            results = connection.execute(query, parameters)
+
+            return {
+                "column_names": [col[0] for col in results.description],
+                "data": results.fetchall()
+            }
+
+    def iter_query(self, query, parameters=(), batch_size=1000, single_column_index=False):
+        """
+        Executes a query and yields the results one row at a time, for queries with too
+        many results to hold in a list. Rows are fetched from sqlite batch_size at a
+        time. A separate cursor is used so that other queries can still be run while
+        iterating. single_column_index works in the same way as in
+        execute_query_and_list_results().
+        The read-only connection is kept until the iteration finishes, so the rows must
+        be read in the thread which started reading them (sqlite3.ProgrammingError is
+        raised otherwise), and an iteration which is stopped early must be closed with
+        close() (e.g. using contextlib.closing()) to give the connection back. The
+        writer connection (inside a write_transaction() or for an in-memory database)
+        can only be released by the thread holding it, and would stop other threads
+        writing while the rows are read, so all the rows are fetched before yielding.
+        """
+        thread_id = threading.get_ident()
+        all_rows = None
+
+        with self._read_connection() as connection:
+            cursor = connection.cursor()
 
             if single_column_index is not False:
-                row_to_add = row_to_add[single_column_index]
+                # sqlite3 calls this for each row, so only the single value is created
+                cursor.row_factory = lambda _, row: row[single_column_index]
 
-            return_list.append(row_to_add)
+            try:
+                cursor.execute(query, parameters)
 
-        return return_list
+                if connection is self.connection:
+                    all_rows = cursor.fetchall()
+                else:
+                    while True:
+                        if threading.get_ident() != thread_id:
+                            raise sqlite3.ProgrammingError(
+                                "iter_query() rows must be read in the thread which "
+                                "started reading them"
+                            )
+
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+
+                        yield from rows
+            finally:
+                cursor.close()
+
+        if all_rows is not None:
+            yield from all_rows
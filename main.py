@@ -6,3 +6,4 @@ if __name__ == "__main__":
     presenter = Presenter()
     app = App(presenter)
     app.mainloop()
+    presenter.close()
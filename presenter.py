@@ -1,5 +1,21 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from database_manager import DatabaseManager
 
+def copy_query_result(result):
+    """
+    Copies the lists and dictionaries of a cached query result, so the cached result
+    isn't changed when the copy is modified (e.g. by prepare_dropdown_options_lists()).
+    The rows themselves are tuples, so they are shared rather than copied.
+    """
+    if isinstance(result, dict):
+        return {key: copy_query_result(value) for key, value in result.items()}
+    if isinstance(result, list):
+        return list(result)
+
+    return result
+
 class Presenter:
     """The presenter class"""
 
@@ -14,17 +30,200 @@ class Presenter:
     COLOUR = "Colour"
     COLUMN_NAMES = "column_names"
 
+    # the events which are published to subscribers when the database is changed
+    STOCK_CHANGED = "stock_changed"
+    ITEM_ADDED = "item_added"
+    ITEM_DELETED = "item_deleted"
+    DESIGN_ADDED = "design_added"
+    PRODUCT_TYPE_ADDED = "product_type_added"
+    LOW_STOCK_CROSSED = "low_stock_crossed"
+
+    # the maximum number of query results kept by cached_call_db()
+    QUERY_CACHE_SIZE = 128
+    # the tables read by DatabaseManager.view_filtered_products() - the buildable
+    # quantity column uses Component and MadeUsing
+    FILTERED_PRODUCTS_TABLES = ["Product", "Design", "ProductType", "Component", "MadeUsing"]
+
     def __init__(self):
-        self.db_manager = DatabaseManager()
+        # a single worker thread creates the DatabaseManager and runs every query. This
+        # stops slow queries from freezing the UI, and queues the queries in order so
+        # that the query cache is always invalidated before a query reads a change.
+        # The DatabaseManager can also be shared with other threads, e.g. a service
+        # which only reads from it - see DatabaseManager.__init__().
+        # whether the current thread is one of the presenter's database threads - see
+        # call_db()
+        self.thread_state = threading.local()
+        self.db_worker = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="database",
+            initializer=self._mark_as_db_thread
+        )
+        self.db_manager = self.db_worker.submit(DatabaseManager).result()
+        # a separate thread for slow read-only queries, so that they don't hold up the
+        # queries and changes queued in the database thread - see submit_slow_query()
+        self.slow_query_worker = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="slow-query",
+            initializer=self._mark_as_db_thread
+        )
+        # the functions to call when each event is published
+        self.subscribers = {}
+        # query results, with the least recently used first - see cached_call_db()
+        self.query_cache = OrderedDict()
+        # the cache is used by both the Tk thread and the database thread
+        self.query_cache_lock = threading.Lock()
+        # the human-friendly column names for each set of raw column names returned by
+        # a query - see process_column_names()
+        self.processed_column_names = {}
+
+    def _mark_as_db_thread(self):
+        """Records that the current thread runs database queries - see call_db()"""
+        self.thread_state.is_db_thread = True
+
+    def call_db(self, func, *args, **kwargs):
+        """
+        Runs a DatabaseManager method in the database thread and waits for its result
+        (any exception it raises is re-raised here)
+        """
+        # stops the database thread waiting for itself, e.g. when a presenter method
+        # called with submit() uses this method, and lets slow queries run in their own
+        # thread rather than queueing in the database thread
+        if getattr(self.thread_state, "is_db_thread", False):
+            return func(*args, **kwargs)
+
+        return self.db_worker.submit(func, *args, **kwargs).result()
+
+    def cached_call_db(self, tables_used, func, *args):
+        """
+        Does the same as call_db(), but keeps the result so that calling the same
+        DatabaseManager method with the same arguments again doesn't query the database.
+        tables_used is a list of the tables the query reads, so the result can be
+        removed from the cache when any of them are changed - see write_db(). Only the
+        QUERY_CACHE_SIZE most recently used results are kept.
+        """
+        key = (func.__name__, args)
+
+        with self.query_cache_lock:
+            cached_query = self.query_cache.get(key)
+
+            if cached_query is not None:
+                self.query_cache.move_to_end(key) # now the most recently used
+                return copy_query_result(cached_query["result"])
+
+        def query_and_store_result():
+            result = func(*args)
+            # the result is stored in the database thread so that a write queued after
+            # this query can't be missed by invalidate_cache()
+            with self.query_cache_lock:
+                self.query_cache[key] = {"result": result, "tables": set(tables_used)}
+
+                if len(self.query_cache) > Presenter.QUERY_CACHE_SIZE:
+                    self.query_cache.popitem(last=False) # least recently used
+
+            return result
+
+        return copy_query_result(self.call_db(query_and_store_result))
+
+    def write_db(self, tables_changed, func, *args):
+        """
+        Does the same as call_db() for a DatabaseManager method which changes the
+        database, then removes the cached results of queries which read any of the
+        tables it changed
+        """
+        def write_and_invalidate_cache():
+            try:
+                return func(*args)
+            finally:
+                self.invalidate_cache(tables_changed)
+
+        return self.call_db(write_and_invalidate_cache)
+
+    def invalidate_cache(self, tables_changed):
+        """Removes the cached results of queries which read any of the given tables"""
+        with self.query_cache_lock:
+            outdated_keys = [
+                key
+                for key, cached_query in self.query_cache.items()
+                if not cached_query["tables"].isdisjoint(tables_changed)
+            ]
+
+            for key in outdated_keys:
+                del self.query_cache[key]
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Runs a function which queries the database using the presenter's methods (e.g.
+        get_filtered_items) in the database thread without waiting for it, and returns
+        a Future for its result. Queued calls can be cancelled with the Future's
+        cancel() method. Tk widgets must only be used in the Tk thread, so the function
+        shouldn't use any widgets or publish events - see UI.utilities.call_when_done()
+        for using the result in the UI.
+        """
+        return self.db_worker.submit(func, *args, **kwargs)
+
+    def submit_slow_query(self, func, *args, **kwargs):
+        """
+        Does the same as submit(), but in a separate thread, for functions which take
+        a long time and only read from the database (e.g. getting the predicted low
+        stock items). The DatabaseManager gives each thread its own read-only
+        connection, so this runs at the same time as the database thread rather than
+        holding up the queries and changes the user is waiting for. The function mustn't
+        change the database or use cached_call_db(), as a cached result could then be
+        stored after a change in the database thread had removed it.
+        """
+        return self.slow_query_worker.submit(func, *args, **kwargs)
+
+    def close(self):
+        """Closes the database connection and stops the database threads"""
+        self.slow_query_worker.shutdown(cancel_futures=True)
+        self.call_db(self.db_manager.close_connection)
+        self.db_worker.shutdown()
+
+    def subscribe(self, event, callback):
+        """
+        Registers a function to be called whenever the event is published, so that the
+        UI can update just the parts affected by a change. The function is called with
+        the details of the change as keyword arguments:
+            STOCK_CHANGED - product_ids, component_ids
+            ITEM_ADDED - item_type, name
+            ITEM_DELETED - item_type, item_id
+            DESIGN_ADDED - name, theme
+            PRODUCT_TYPE_ADDED - name, product_type, sub_type
+            LOW_STOCK_CROSSED - items (a list of (item type, item ID, name, stock, low
+                stock warning) tuples of the items which have just become low on stock)
+        """
+        self.subscribers.setdefault(event, []).append(callback)
+
+    def publish(self, event, **details):
+        """Calls every function subscribed to the event with the details of the change"""
+        for callback in self.subscribers.get(event, []):
+            callback(**details)
+
+    def publish_stock_changes(self, product_ids, component_ids, low_stock_crossings):
+        """
+        Publishes the STOCK_CHANGED event, and the LOW_STOCK_CROSSED event if any of
+        the items have just become low on stock
+        """
+        self.publish(
+            Presenter.STOCK_CHANGED, product_ids=product_ids, component_ids=component_ids
+        )
+
+        if low_stock_crossings:
+            self.publish(Presenter.LOW_STOCK_CROSSED, items=low_stock_crossings)
 
     def get_filtered_items(self, filters_dict=None):
         """
         Get the products according to the provided filters, and tidy up the column names
         """
         if filters_dict is None: #no filters applied initially
-            filtered_items = self.db_manager.view_filtered_products()
+            filtered_items = self.cached_call_db(
+                Presenter.FILTERED_PRODUCTS_TABLES,
+                self.db_manager.view_filtered_products
+            )
         elif filters_dict[Presenter.ITEM_TYPE] == Presenter.PRODUCT:
-            filtered_items = self.db_manager.view_filtered_products(
+            filtered_items = self.cached_call_db(
+                Presenter.FILTERED_PRODUCTS_TABLES,
+                self.db_manager.view_filtered_products,
                 filters_dict[Presenter.NAME],
                 filters_dict[Presenter.DESIGN],
                 filters_dict[Presenter.THEME],
@@ -33,7 +232,9 @@ class Presenter:
                 filters_dict[Presenter.COLOUR]
             )
         elif filters_dict[Presenter.ITEM_TYPE] == Presenter.COMPONENT:
-            filtered_items = self.db_manager.view_filtered_components(
+            filtered_items = self.cached_call_db(
+                ["Component"],
+                self.db_manager.view_filtered_components,
                 filters_dict[Presenter.NAME]
             )
 
@@ -46,58 +247,126 @@ class Presenter:
     def process_column_names(self, column_names):
         """
         Converts the raw database column names into more human-friendly ones
-        e.g. 'product_id' -> 'Product ID'
+        e.g. 'product_id' -> 'Product ID'. Each query always returns the same columns,
+        so the converted names are worked out once per set of columns and then looked
+        up.
         """
-        processed_column_names = []
+        column_names = tuple(column_names)
+        processed_column_names = self.processed_column_names.get(column_names)
+
+        if processed_column_names is None:
+            processed_column_names = [
+                self.process_column_name(column_name) for column_name in column_names
+            ]
+            self.processed_column_names[column_names] = processed_column_names
+
+        return list(processed_column_names) # a copy, so the stored list can't change
 
-        for column_name in column_names:
-            processed_column_name = column_name.replace("_", " ")
-            processed_column_name = processed_column_name.title() #capitalise
-            processed_column_name = processed_column_name.replace("Id", "ID")
-            processed_column_names.append(processed_column_name)
+    def process_column_name(self, column_name):
+        """Converts a raw database column name into a more human-friendly one"""
+        processed_column_name = column_name.replace("_", " ")
+        processed_column_name = processed_column_name.title() #capitalise
+        processed_column_name = processed_column_name.replace("Id", "ID")
 
-        return processed_column_names
+        return processed_column_name
 
     def get_product_designs(self):
-        return self.db_manager.view_design_names()
+        return self.cached_call_db(["Design"], self.db_manager.view_design_names)
 
     def get_product_themes(self):
-        return self.db_manager.view_theme_names()
+        return self.cached_call_db(["Design"], self.db_manager.view_theme_names)
 
     def get_product_types(self):
-        return self.db_manager.view_type_types()
+        return self.cached_call_db(["ProductType"], self.db_manager.view_type_types)
 
     def get_product_sub_types(self):
-        return self.db_manager.view_sub_type_names()
+        return self.cached_call_db(["ProductType"], self.db_manager.view_sub_type_names)
 
     def get_product_type_names(self):
-        return self.db_manager.view_type_names()
+        return self.cached_call_db(["ProductType"], self.db_manager.view_type_names)
 
     def get_product_colours(self):
-        return self.db_manager.view_colour_names()
+        return self.cached_call_db(["Product"], self.db_manager.view_colour_names)
 
     def get_component_names(self):
-        return self.db_manager.view_component_names()
+        return self.cached_call_db(["Component"], self.db_manager.view_component_names)
 
-    def get_low_stock_items(self, products=True, components=True):
-        low_stock_items = self.db_manager.view_low_stock_items(products, components)
+    def get_buildable_quantities(self):
+        """
+        Gets how many of each product can be made from the components currently in
+        stock, and tidies up the column names
+        """
+        buildable_quantities = self.cached_call_db(
+            ["Product", "Component", "MadeUsing"],
+            self.db_manager.view_buildable_quantities
+        )
+        buildable_quantities[Presenter.COLUMN_NAMES] = self.process_column_names(
+            buildable_quantities[Presenter.COLUMN_NAMES]
+        )
+
+        return buildable_quantities
+
+    def get_low_stock_items(
+        self,
+        products=True,
+        components=True,
+        include_days_of_cover=False,
+        predicted_low_days=None
+    ):
+        low_stock_items = self.call_db(
+            self.db_manager.view_low_stock_items,
+            products,
+            components,
+            include_days_of_cover,
+            predicted_low_days
+        )
         low_stock_items[Presenter.COLUMN_NAMES] = self.process_column_names(
             low_stock_items[Presenter.COLUMN_NAMES]
         )
 
         return low_stock_items
 
+    def get_sales_velocity(self, products=True, components=True):
+        """
+        Gets how many of each item have been used per day recently and how many days
+        of stock are left, and tidies up the column names
+        """
+        sales_velocity = self.call_db(
+            self.db_manager.view_sales_velocity, products, components
+        )
+        sales_velocity[Presenter.COLUMN_NAMES] = self.process_column_names(
+            sales_velocity[Presenter.COLUMN_NAMES]
+        )
+
+        return sales_velocity
+
     def save_new_design(self, name, theme):
         """Saves a new design into the database"""
-        self.db_manager.insert_new_design(name, theme)
+        self.write_db(["Design"], self.db_manager.insert_new_design, name, theme)
+        self.publish(Presenter.DESIGN_ADDED, name=name, theme=theme)
 
     def save_new_product_type(self, name, product_type, sub_type):
         """Saves a new product type into the database"""
-        self.db_manager.insert_new_product_type(name, product_type, sub_type)
+        self.write_db(
+            ["ProductType"],
+            self.db_manager.insert_new_product_type,
+            name, product_type, sub_type
+        )
+        self.publish(
+            Presenter.PRODUCT_TYPE_ADDED,
+            name=name,
+            product_type=product_type,
+            sub_type=sub_type
+        )
 
     def save_new_component(self, name, stock, low_stock_warning):
         """Saves a new component into the database"""
-        self.db_manager.insert_new_component(name, stock, low_stock_warning)
+        self.write_db(
+            ["Component"],
+            self.db_manager.insert_new_component,
+            name, stock, low_stock_warning
+        )
+        self.publish(Presenter.ITEM_ADDED, item_type=Presenter.COMPONENT, name=name)
 
     def save_new_product(
         self,
@@ -110,9 +379,12 @@ class Presenter:
         components
     ):
         """Saves a new product into the database"""
-        self.db_manager.insert_new_product(
+        self.write_db(
+            ["Product", "MadeUsing"],
+            self.db_manager.insert_new_product,
             name, design, colour, product_type, stock, low_stock_warning, components
         )
+        self.publish(Presenter.ITEM_ADDED, item_type=Presenter.PRODUCT, name=name)
 
     def update_product_stock_level(self, product_id, increase_decrease_amount):
         """
@@ -120,7 +392,12 @@ class Presenter:
         amount, e.g. if the current stock level is 5 and increase_decrease_amount is -1,
         then the new stock level will be 4.
         """
-        self.db_manager.update_product_stock_level(product_id, increase_decrease_amount)
+        low_stock_crossings = self.write_db(
+            ["Product"],
+            self.db_manager.update_product_stock_level,
+            product_id, increase_decrease_amount
+        )
+        self.publish_stock_changes([product_id], [], low_stock_crossings)
 
     def update_component_stock_level(self, component_id, increase_decrease_amount):
         """
@@ -128,9 +405,12 @@ class Presenter:
         amount, e.g. if the current stock level is 5 and increase_decrease_amount is -1,
         then the new stock level will be 4.
         """
-        self.db_manager.update_component_stock_level(
+        low_stock_crossings = self.write_db(
+            ["Component"],
+            self.db_manager.update_component_stock_level,
             component_id, increase_decrease_amount
         )
+        self.publish_stock_changes([], [component_id], low_stock_crossings)
 
     def update_product_stock_level_and_its_components_stock_levels(
         self,
@@ -139,16 +419,66 @@ class Presenter:
     ):
         """
         Does the same thing as update_product_stock_level() but also updates the stock
-        levels of the components used to make the product
+        levels of the components used to make the product, all in one transaction
         """
+        # a negative change is a sale, which reduces the stock levels
+        low_stock_crossings = self.write_db(
+            ["Product", "Component"],
+            self.db_manager.sell_product,
+            product_id, -product_stock_level_change
+        )
+
+        # a single notification for all the changes
         components_and_quantities = self.get_components_of_product(product_id)
-        # reduce the stock level of each component that is used to make the product
-        for component_id, component_quantity in components_and_quantities:
-            component_update_amount = product_stock_level_change * component_quantity
-            self.update_component_stock_level(component_id, component_update_amount)
+        self.publish_stock_changes(
+            [product_id],
+            [component_id for component_id, _ in components_and_quantities],
+            low_stock_crossings
+        )
 
-        # update product stock
-        self.update_product_stock_level(product_id, product_stock_level_change)
+    def apply_orders(self, order_lines):
+        """
+        Sells the products in a batch of orders in a single transaction. order_lines is
+        a list of (product name, quantity) tuples, e.g. from an Etsy order export.
+        Returns the low stock items after the orders have been applied.
+        """
+        result = self.write_db(
+            ["Product", "Component"], self.db_manager.apply_orders, order_lines
+        )
+        self.publish_stock_changes(
+            result["product_ids"], result["component_ids"], result["low_stock_crossings"]
+        )
+
+        low_stock_items = result["low_stock_items"]
+        low_stock_items[Presenter.COLUMN_NAMES] = self.process_column_names(
+            low_stock_items[Presenter.COLUMN_NAMES]
+        )
+
+        return low_stock_items
+
+    def plan_component_requirements(self, quantities_by_product_id):
+        """
+        Gets the number of each component required to make the given quantities of
+        products (a dictionary of product IDs and quantities), the number in stock and
+        the shortfall, and tidies up the column names
+        """
+        requirements = self.call_db(
+            self.db_manager.plan_component_requirements, quantities_by_product_id
+        )
+        requirements[Presenter.COLUMN_NAMES] = self.process_column_names(
+            requirements[Presenter.COLUMN_NAMES]
+        )
+
+        return requirements
+
+    def get_stock_as_of(self, item_type, item_id, timestamp):
+        """
+        Gets the stock level that the product or component (item_type is "Product" or
+        "Component") had at the given time, e.g. "2024-03-01 12:00:00"
+        """
+        return self.call_db(
+            self.db_manager.view_stock_as_of, item_type, item_id, timestamp
+        )
 
     def get_components_of_product(self, product_id):
         """
@@ -158,14 +488,22 @@ class Presenter:
         tuple is the component ID and the second element is the quantity used in the
         product
         """
-        return self.db_manager.view_components_of_product(product_id)
+        return self.call_db(self.db_manager.view_components_of_product, product_id)
 
     def get_component_name_from_id(self, component_id):
         """Gets the name of the component which has the given ID"""
-        return self.db_manager. view_component_name_from_id(component_id)
+        return self.call_db(self.db_manager.view_component_name_from_id, component_id)
 
     def delete_product(self, product_id):
-        self.db_manager.delete_product(product_id)
+        self.write_db(["Product", "MadeUsing"], self.db_manager.delete_product, product_id)
+        self.publish(
+            Presenter.ITEM_DELETED, item_type=Presenter.PRODUCT, item_id=product_id
+        )
 
     def delete_component(self, component_id):
-        self.db_manager.delete_component(component_id)
+        self.write_db(
+            ["Component", "MadeUsing"], self.db_manager.delete_component, component_id
+        )
+        self.publish(
+            Presenter.ITEM_DELETED, item_type=Presenter.COMPONENT, item_id=component_id
+        )
@@ -8,7 +8,8 @@ See https://www.tutorialspoint.com/pytest/index.htm for more help
 """
 
 import pytest
-from database_manager import DatabaseManager
+from concurrent.futures import ThreadPoolExecutor
+from database_manager import DatabaseManager, DuplicateNameError
 import sqlite3
 
 @pytest.fixture
@@ -18,6 +19,48 @@ def db():
     yield db # provides db to the test
     db.close_connection() #teardown
 
+@pytest.fixture
+def file_db(tmp_path, monkeypatch):
+    """
+    Sets up the database in a temporary folder, for the tests which need read-only
+    connections (an in-memory database can't have them)
+    """
+    monkeypatch.chdir(tmp_path)
+    file_db = DatabaseManager(num_readers=2)
+    yield file_db
+    file_db.close_connection()
+
+@pytest.mark.parametrize("profile", ["durable", "fast", "bulk"])
+def test_performance_profile(profile):
+    """Tests that each performance profile's settings are applied to the connection"""
+    db = DatabaseManager(save_database_in_memory=True, profile=profile)
+    expected_settings = DatabaseManager.PERFORMANCE_PROFILES[profile]
+    settings = db.get_performance_settings()
+    db.close_connection()
+
+    # journal_mode and mmap_size can't be set for an in-memory database
+    assert settings["synchronous"] == expected_settings["synchronous"]
+    assert settings["cache_size"] == expected_settings["cache_size"]
+    assert settings["temp_store"] == expected_settings["temp_store"]
+
+@pytest.mark.parametrize("profile", ["durable", "fast", "bulk"])
+def test_performance_profile_file_database(profile, tmp_path, monkeypatch):
+    """
+    Tests that a database saved to disc reports its writer connection's settings,
+    rather than those of one of the read-only connections
+    """
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseManager(profile=profile)
+    settings = db.get_performance_settings()
+    db.close_connection()
+
+    assert settings == DatabaseManager.PERFORMANCE_PROFILES[profile] | {"journal_mode": "wal"}
+
+def test_invalid_performance_profile():
+    """Tests that an error is raised if the performance profile doesn't exist"""
+    with pytest.raises(ValueError):
+        DatabaseManager(save_database_in_memory=True, profile="invalid")
+
 def test_insert_data(db):
     """Tests the insert_data() function"""
     table_name = "Component"
@@ -31,6 +74,29 @@ def test_insert_data(db):
     assert stock == db_row[2]
     assert low_stock == db_row[3]
 
+def test_insert_many(db):
+    """Tests the insert_many() function"""
+    component_rows = [["Name1", 1, 0], ["Name2", 2, 1], ["Name3", 3, 2]]
+    db.insert_many("Component", component_rows)
+
+    retrieved_names = db.view_component_names()
+
+    assert set(retrieved_names) == {"Name1", "Name2", "Name3"}
+
+def test_insert_many_with_duplicate_names(db):
+    """
+    Tests that insert_many() reports the rows with duplicate names and doesn't insert
+    any of the rows
+    """
+    db.insert_new_component("Name1", 1, 0)
+    component_rows = [["Name2", 2, 1], ["Name1", 3, 2], ["Name2", 4, 3]]
+
+    with pytest.raises(DuplicateNameError) as error_info:
+        db.insert_many("Component", component_rows)
+
+    assert error_info.value.colliding_rows == [(1, "Name1"), (2, "Name2")]
+    assert db.view_component_names() == ["Name1"]
+
 def test_insert_new_design(db):
     """Tests the insert_new_design() function"""
     name = "Name"
@@ -89,6 +155,82 @@ def test_insert_new_product(db):
     assert product_prequisite_dict["component1_quantity"] == retrieved_component_quantities[0]
     assert product_prequisite_dict["component2_quantity"] == retrieved_component_quantities[1]
 
+def test_insert_new_product_with_unknown_component(db):
+    """
+    Tests that insert_new_product() doesn't insert the product if one of its components
+    doesn't exist
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+
+    with pytest.raises(sqlite3.DataError):
+        db.insert_new_product(
+            "ProductName",
+            product_prequisite_dict["design_name"],
+            product_prequisite_dict["colour"],
+            product_prequisite_dict["type_name"],
+            product_prequisite_dict["stock"],
+            product_prequisite_dict["low_stock"],
+            [(product_prequisite_dict["component1_name"], 1), ("UnknownName", 1)]
+        )
+
+    assert len(db.view_filtered_products()["data"]) == 0
+
+def test_insert_new_products_bulk(db):
+    """Tests the insert_new_products_bulk() function"""
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    components = [
+        (
+            product_prequisite_dict["component1_name"],
+            product_prequisite_dict["component1_quantity"]
+        )
+    ]
+    products = [
+        (
+            product_name,
+            product_prequisite_dict["design_name"],
+            product_prequisite_dict["colour"],
+            product_prequisite_dict["type_name"],
+            product_prequisite_dict["stock"],
+            product_prequisite_dict["low_stock"],
+            components
+        )
+        for product_name in ["Product1Name", "Product2Name"]
+    ]
+    db.insert_new_products_bulk(products)
+
+    product_rows = db.view_filtered_products()["data"]
+
+    assert [row[1] for row in product_rows] == ["Product1Name", "Product2Name"]
+    assert db.view_components_of_product(product_rows[1][0]) == [
+        (1, product_prequisite_dict["component1_quantity"])
+    ]
+
+def test_insert_new_products_bulk_with_duplicate_names(db):
+    """
+    Tests that insert_new_products_bulk() doesn't insert anything if a product name is
+    already in use
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("Product1Name", db, product_prequisite_dict)
+    products = [
+        (
+            product_name,
+            product_prequisite_dict["design_name"],
+            product_prequisite_dict["colour"],
+            product_prequisite_dict["type_name"],
+            product_prequisite_dict["stock"],
+            product_prequisite_dict["low_stock"],
+            []
+        )
+        for product_name in ["Product2Name", "Product1Name"]
+    ]
+
+    with pytest.raises(DuplicateNameError) as error_info:
+        db.insert_new_products_bulk(products)
+
+    assert error_info.value.colliding_rows == [(1, "Product1Name")]
+    assert len(db.view_filtered_products()["data"]) == 1
+
 def test_view_filtered_products(db):
     """Tests the view_filtered_products function"""
     product1_name = "Product1Name"
@@ -102,6 +244,44 @@ def test_view_filtered_products(db):
     assert len(filtered_rows) == 1
     assert filtered_rows[0][1] == product2_name
 
+@pytest.mark.parametrize("name_search_enabled", [True, False])
+@pytest.mark.parametrize(
+    "name_search, expected_names",
+    [
+        ("neck", ["Web necklace - black"]),
+        ("NECKLACE", ["Web necklace - black"]),
+        ("ea", ["Heart earrings - pink"]),
+        ("- ", ["Heart earrings - pink", "Web necklace - black"]),
+        ("bracelet", [])
+    ]
+)
+def test_view_filtered_products_name_search(
+    db, name_search_enabled, name_search, expected_names
+):
+    """
+    Tests that searching by name finds products containing the search text, both with
+    and without the full-text search index
+    """
+    db.name_search_enabled = name_search_enabled
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("Web necklace - black", db, product_prequisite_dict)
+    _insert_new_product("Heart earrings - pink", db, product_prequisite_dict)
+
+    filtered_rows = db.view_filtered_products(name_search=name_search)["data"]
+
+    assert sorted(row[1] for row in filtered_rows) == expected_names
+
+def test_name_search_index_kept_up_to_date(db):
+    """Tests that the full-text search index is updated when components change"""
+    db.insert_new_component("OldName", 1, 0)
+    db.insert_new_component("OtherName", 1, 0)
+    db.cursor.execute("UPDATE Component SET name = 'NewName' WHERE component_id = 1")
+    db.delete_component(2)
+
+    assert db.view_filtered_components(name_search="OldName")["data"] == []
+    assert db.view_filtered_components(name_search="OtherName")["data"] == []
+    assert db.view_filtered_components(name_search="NewName")["data"][0][1] == "NewName"
+
 def test_view_filtered_components(db):
     """Tests the view_filtered_components() function"""
     name1 = "Name1"
@@ -119,6 +299,84 @@ def test_view_filtered_components(db):
     assert len(filtered_rows) == 1
     assert filtered_rows[0][1] == name2
 
+@pytest.mark.parametrize(
+    "order_by, expected_names",
+    [
+        ("id", ["E", "B", "D", "A", "C"]),
+        ("name", ["A", "B", "C", "D", "E"])
+    ]
+)
+def test_view_filtered_components_pages(db, order_by, expected_names):
+    """
+    Tests that view_filtered_components() returns every component, in order, when
+    reading it a page at a time
+    """
+    db.insert_many("Component", [[name, 1, 0] for name in ["E", "B", "D", "A", "C"]])
+    page_names = []
+    after_key = None
+
+    while True:
+        page = db.view_filtered_components(
+            order_by=order_by, limit=2, after_key=after_key, include_total_count=True
+        )
+        page_names.append([row[1] for row in page["data"]])
+        assert page["total_count"] == 5
+
+        after_key = page["next_key"]
+        if after_key is None:
+            break
+
+    assert page_names == [expected_names[0:2], expected_names[2:4], expected_names[4:]]
+
+def test_view_filtered_products_page_with_filter(db):
+    """Tests that filters are applied to the pages of products and the total count"""
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    for product_name in ["Product1Name", "Other", "Product2Name", "Product3Name"]:
+        _insert_new_product(product_name, db, product_prequisite_dict)
+
+    page = db.view_filtered_products(
+        name_search="Product", order_by="name", limit=2, include_total_count=True
+    )
+
+    assert [row[1] for row in page["data"]] == ["Product1Name", "Product2Name"]
+    assert page["next_key"] == "Product2Name"
+    assert page["total_count"] == 3
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_view_filtered_components_invalid_limit(db, limit):
+    """Tests that an error is raised when the page size is less than 1"""
+    db.insert_many("Component", [["Name1", 1, 0]])
+
+    with pytest.raises(sqlite3.DataError):
+        db.view_filtered_components(limit=limit)
+
+def test_view_filtered_components_after_key_without_order(db):
+    """
+    Tests that an error is raised when carrying on from a key without any ordering,
+    rather than returning every component
+    """
+    db.insert_many("Component", [["Name1", 1, 0], ["Name2", 1, 0]])
+
+    with pytest.raises(sqlite3.DataError):
+        db.view_filtered_components(after_key=1)
+
+def test_view_filtered_components_validated_before_counting(db, monkeypatch):
+    """Tests that invalid pages are rejected before the total count query is run"""
+    def fail_if_queried(*args, **kwargs):
+        pytest.fail("The database was queried")
+
+    monkeypatch.setattr(db, "execute_query_and_list_results", fail_if_queried)
+
+    with pytest.raises(sqlite3.DataError):
+        db.view_filtered_components(limit=0, include_total_count=True)
+    with pytest.raises(sqlite3.DataError):
+        db.view_filtered_components(order_by="stock", include_total_count=True)
+
+def test_view_filtered_products_invalid_order_by(db):
+    """Tests that an error is raised when ordering by an invalid option"""
+    with pytest.raises(sqlite3.DataError):
+        db.view_filtered_products(order_by="1; DROP TABLE Product")
+
 def test_view_low_stock_items(db):
     """Tests the view_low_stock_items() function"""
     product1_name = "Product1Name"
@@ -137,6 +395,107 @@ def test_view_low_stock_items(db):
     assert low_stock_rows[0][0] in low_stock_item_names
     assert low_stock_rows[1][0] in low_stock_item_names
 
+def test_view_low_stock_items_with_same_names(db):
+    """
+    Tests that a low stock product and component with the same name are both returned,
+    with their item types
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    product_prequisite_dict["stock"] = 1
+    _insert_new_product(product_prequisite_dict["component1_name"], db, product_prequisite_dict)
+
+    low_stock_rows = db.view_low_stock_items()["data"]
+
+    assert sorted(low_stock_rows) == [
+        (product_prequisite_dict["component1_name"], 1, 2, "Product"),
+        (product_prequisite_dict["component1_name"], 2, 3, "Component")
+    ]
+
+def test_view_sales_velocity(db):
+    """
+    Tests that view_sales_velocity() works out the units used per day over each window
+    from the stock decrements, and the days of cover at the 30 day rate
+    """
+    _insert_component_with_sales_history(db)
+
+    sales_velocity = db.view_sales_velocity(products=False)
+
+    assert sales_velocity["column_names"] == [
+        "name",
+        "stock",
+        "low_stock_warning",
+        "units_per_day_last_7_days",
+        "units_per_day_last_30_days",
+        "units_per_day_last_90_days",
+        "days_of_cover",
+        "item_type"
+    ]
+    assert sales_velocity["data"] == [
+        ("UsedComponent", 76, 0, 2.0, 1.47, 1.49, 51.8, "Component"),
+        ("UnusedComponent", 5, 0, 0.0, 0.0, 0.0, None, "Component")
+    ]
+
+def test_view_low_stock_items_predicted_low(db):
+    """
+    Tests that view_low_stock_items() returns the items which aren't low on stock yet
+    but are predicted to run out within predicted_low_days
+    """
+    used_component_name = _insert_component_with_sales_history(db)
+    db.insert_new_component("LowComponent", 1, 2)
+
+    assert db.view_low_stock_items(predicted_low_days=30)["data"] == []
+    low_stock_items = db.view_low_stock_items(predicted_low_days=60)
+    assert low_stock_items["column_names"] == [
+        "name", "stock", "low_stock_warning", "days_of_cover", "item_type"
+    ]
+    assert low_stock_items["data"] == [(used_component_name, 76, 0, 51.8, "Component")]
+
+def test_view_low_stock_items_with_days_of_cover(db):
+    """
+    Tests that view_low_stock_items() can include the days of cover of the low stock
+    items, while still reading them from the low stock indexes
+    """
+    _insert_component_with_sales_history(db)
+    db.cursor.execute("UPDATE Component SET low_stock_warning = 100 WHERE component_id = 1")
+    db.insert_new_component("LowComponent", 1, 2)
+    executed_queries = []
+    db.connection.set_trace_callback(executed_queries.append)
+
+    low_stock_items = db.view_low_stock_items(products=False, include_days_of_cover=True)
+
+    db.connection.set_trace_callback(None)
+    assert low_stock_items["column_names"] == [
+        "name", "stock", "low_stock_warning", "days_of_cover", "item_type"
+    ]
+    assert sorted(low_stock_items["data"]) == [
+        ("LowComponent", 1, 2, None, "Component"),
+        ("UsedComponent", 76, 100, 51.8, "Component")
+    ]
+    query_plan = " ".join(
+        row[3]
+        for row in db.execute_query_and_list_results(
+            "EXPLAIN QUERY PLAN " + executed_queries[-1]
+        )
+    )
+    assert "COVERING INDEX ComponentLowStockIndex" in query_plan
+
+def test_view_low_stock_items_uses_low_stock_indexes(db):
+    """Tests that view_low_stock_items() reads the partial low stock indexes"""
+    executed_queries = []
+    db.connection.set_trace_callback(executed_queries.append)
+    db.view_low_stock_items()
+    db.connection.set_trace_callback(None)
+
+    query_plan = " ".join(
+        row[3]
+        for row in db.execute_query_and_list_results(
+            "EXPLAIN QUERY PLAN " + executed_queries[-1]
+        )
+    )
+
+    for index_name, _ in DatabaseManager.LOW_STOCK_INDEXES:
+        assert f"COVERING INDEX {index_name}" in query_plan
+
 def test_update_product_stock_level(db):
     """Tests the update_product_stock_level() function"""
     product1_name = "Product1Name"
@@ -153,6 +512,38 @@ def test_update_product_stock_level(db):
     assert product_rows[0][3] == product_prequisite_dict["stock"]
     assert product_rows[1][3] == (product_prequisite_dict["stock"] + stock_change_amount)
 
+def test_update_stock_level_returns_low_stock_crossings(db):
+    """
+    Tests that updating a stock level returns the item only when it drops to or below
+    its low stock warning
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("ProductName", db, product_prequisite_dict)
+
+    # stock 3, warning 2
+    assert db.update_product_stock_level(1, 1) == []
+    assert db.update_product_stock_level(1, -2) == [("Product", 1, "ProductName", 2, 2)]
+    # already low, so it doesn't cross the warning again
+    assert db.update_product_stock_level(1, -1) == []
+    # component2 has stock 10, warning 4
+    assert db.update_component_stock_level(2, -7) == [
+        ("Component", 2, product_prequisite_dict["component2_name"], 3, 4)
+    ]
+
+def test_sell_product_returns_low_stock_crossings(db):
+    """Tests that sell_product() returns the product and components which become low"""
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("ProductName", db, product_prequisite_dict)
+
+    # product: 3 -> 0 (warning 2), component1 is already low, component2: 10 -> 4
+    # (warning 4)
+    low_stock_crossings = db.sell_product(1, 3)
+
+    assert low_stock_crossings == [
+        ("Product", 1, "ProductName", 0, 2),
+        ("Component", 2, product_prequisite_dict["component2_name"], 4, 4)
+    ]
+
 def test_update_component_stock_level(db):
     """Tests the update_component_stock_level() function"""
     product_name = "ProductName"
@@ -169,6 +560,335 @@ def test_update_component_stock_level(db):
         product_prequisite_dict["component2_stock"] + stock_change_amount
     )
 
+def test_sell_product(db):
+    """
+    Tests that sell_product() reduces the stock level of the product and of the
+    components used to make it
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("Product1Name", db, product_prequisite_dict)
+    _insert_new_product("Product2Name", db, product_prequisite_dict)
+    quantity = 2
+
+    db.sell_product(2, quantity)
+
+    product_rows = db.view_filtered_products()["data"]
+    component_rows = db.view_filtered_components()["data"]
+
+    assert product_rows[0][3] == product_prequisite_dict["stock"]
+    assert product_rows[1][3] == product_prequisite_dict["stock"] - quantity
+    assert component_rows[0][2] == (
+        product_prequisite_dict["component1_stock"]
+        - quantity * product_prequisite_dict["component1_quantity"]
+    )
+    assert component_rows[1][2] == (
+        product_prequisite_dict["component2_stock"]
+        - quantity * product_prequisite_dict["component2_quantity"]
+    )
+
+def test_sell_unknown_product(db):
+    """Tests that selling a product which doesn't exist changes nothing"""
+    product_prequisite_dict = _setup_product_prerequisites(db)
+
+    with pytest.raises(sqlite3.DataError):
+        db.sell_product(1, 1)
+
+    component_rows = db.view_filtered_components()["data"]
+
+    assert component_rows[0][2] == product_prequisite_dict["component1_stock"]
+    assert component_rows[1][2] == product_prequisite_dict["component2_stock"]
+
+def test_apply_orders(db):
+    """
+    Tests that apply_orders() totals the quantities of each product, reduces the stock
+    levels of the products and their components, and returns the low stock items
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("Product1Name", db, product_prequisite_dict)
+    _insert_new_product("Product2Name", db, product_prequisite_dict)
+    _insert_new_product("Product3Name", db, product_prequisite_dict)
+
+    result = db.apply_orders(
+        [("Product1Name", 1), ("Product2Name", 1), ("Product1Name", 1)]
+    )
+
+    product_stock_levels = [row[3] for row in db.view_filtered_products()["data"]]
+    component_stock_levels = [row[2] for row in db.view_filtered_components()["data"]]
+    num_sold = 3
+    low_stock_names = [row[0] for row in result["low_stock_items"]["data"]]
+
+    assert product_stock_levels == [
+        product_prequisite_dict["stock"] - 2,
+        product_prequisite_dict["stock"] - 1,
+        product_prequisite_dict["stock"]
+    ]
+    assert component_stock_levels == [
+        product_prequisite_dict["component1_stock"]
+        - num_sold * product_prequisite_dict["component1_quantity"],
+        product_prequisite_dict["component2_stock"]
+        - num_sold * product_prequisite_dict["component2_quantity"]
+    ]
+    assert sorted(result["low_stock_crossings"]) == [
+        ("Component", 2, "Component2Name", 4, 4),
+        ("Product", 1, "Product1Name", 1, 2),
+        ("Product", 2, "Product2Name", 2, 2)
+    ]
+    assert sorted(result["product_ids"]) == [1, 2]
+    assert sorted(result["component_ids"]) == [1, 2]
+    assert sorted(low_stock_names) == [
+        "Component1Name", "Component2Name", "Product1Name", "Product2Name"
+    ]
+
+def test_apply_orders_with_unknown_product(db):
+    """Tests that no stock levels change if any of the order lines are invalid"""
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("Product1Name", db, product_prequisite_dict)
+
+    with pytest.raises(sqlite3.DataError):
+        db.apply_orders([("Product1Name", 1), ("UnknownProduct", 1)])
+
+    assert db.view_filtered_products()["data"][0][3] == product_prequisite_dict["stock"]
+    assert db.view_filtered_components()["data"][0][2] == (
+        product_prequisite_dict["component1_stock"]
+    )
+
+def test_view_buildable_quantities(db):
+    """
+    Tests that view_buildable_quantities() returns how many of each product can be
+    made from the components in stock
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("Product1Name", db, product_prequisite_dict)
+    db.insert_new_product(
+        "Product2Name",
+        product_prequisite_dict["design_name"],
+        product_prequisite_dict["colour"],
+        product_prequisite_dict["type_name"],
+        1,
+        0,
+        [(product_prequisite_dict["component2_name"], 3)]
+    )
+    db.insert_new_product(
+        "Product3Name",
+        product_prequisite_dict["design_name"],
+        product_prequisite_dict["colour"],
+        product_prequisite_dict["type_name"],
+        1,
+        0,
+        []
+    )
+
+    buildable_rows = db.view_buildable_quantities()["data"]
+    filtered_product_rows = db.view_filtered_products()["data"]
+
+    # component1 limits product 1 (2 // 1), component2 limits product 2 (10 // 3)
+    assert buildable_rows == [
+        (1, "Product1Name", 2), (2, "Product2Name", 3), (3, "Product3Name", None)
+    ]
+    assert [row[-1] for row in filtered_product_rows] == [2, 3, None]
+
+def test_plan_component_requirements(db):
+    """
+    Tests that plan_component_requirements() totals the components needed for all the
+    products, and works out the shortfalls
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("Product1Name", db, product_prequisite_dict)
+    _insert_new_product("Product2Name", db, product_prequisite_dict)
+
+    requirements = db.plan_component_requirements({1: 2, 2: 1})
+
+    # component1: 3 * 1 needed, 2 in stock. component2: 3 * 2 needed, 10 in stock
+    assert requirements["column_names"] == [
+        "component_id", "name", "required", "on_hand", "shortfall"
+    ]
+    assert requirements["data"] == [
+        (1, product_prequisite_dict["component1_name"], 3, 2, 1),
+        (2, product_prequisite_dict["component2_name"], 6, 10, 0)
+    ]
+
+def test_plan_component_requirements_with_unknown_product(db):
+    """Tests that planning to make a product which doesn't exist raises an error"""
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("Product1Name", db, product_prequisite_dict)
+
+    with pytest.raises(sqlite3.DataError):
+        db.plan_component_requirements({1: 1, 5: 1})
+
+def test_stock_movements_recorded(db):
+    """Tests that every stock level change is recorded in StockMovement with its reason"""
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("ProductName", db, product_prequisite_dict)
+    db.update_product_stock_level(1, -1)
+    db.sell_product(1, 1)
+    db.update_product_stock_level(1, 0) # no change, so no movement
+
+    movements = db.execute_query_and_list_results(
+        """SELECT item_type, item_id, change, reason
+           FROM StockMovement
+           ORDER BY movement_id"""
+    )
+
+    assert movements == [
+        ("Component", 1, product_prequisite_dict["component1_stock"], "opening stock"),
+        ("Component", 2, product_prequisite_dict["component2_stock"], "opening stock"),
+        ("Product", 1, product_prequisite_dict["stock"], "opening stock"),
+        ("Product", 1, -1, "adjustment"),
+        ("Product", 1, -1, "sale"),
+        ("Component", 1, -product_prequisite_dict["component1_quantity"], "sale"),
+        ("Component", 2, -product_prequisite_dict["component2_quantity"], "sale")
+    ]
+
+def test_stock_movements_recorded_from_other_connections(file_db):
+    """
+    Tests that stock changes made without the DatabaseManager (e.g. with the sqlite
+    command line) are recorded in StockMovement too, without a reason
+    """
+    file_db.insert_new_component("ComponentName", 10, 0)
+
+    other_connection = sqlite3.connect(file_db.database_file_name)
+    with other_connection:
+        other_connection.execute("UPDATE Component SET stock = stock - 3")
+    other_connection.close()
+    file_db.update_component_stock_level(1, -2)
+
+    movements = file_db.execute_query_and_list_results(
+        "SELECT change, reason FROM StockMovement ORDER BY movement_id"
+    )
+
+    assert movements == [(10, "opening stock"), (-3, None), (-2, "adjustment")]
+    assert file_db.view_stock_as_of("Component", 1, "9999-12-31 00:00:00") == 5
+
+def test_view_stock_as_of(db):
+    """
+    Tests that view_stock_as_of() adds up the movements up to the given time, starting
+    from the latest snapshot before it
+    """
+    product_prequisite_dict = _setup_product_prerequisites(db)
+    _insert_new_product("ProductName", db, product_prequisite_dict) # stock 3
+    db.update_product_stock_level(1, -1)
+    db.cursor.execute(
+        """UPDATE StockMovement
+           SET moved_at = CASE reason
+                              WHEN 'opening stock' THEN '2024-01-01 00:00:00.000'
+                              ELSE '2024-02-01 00:00:00.000'
+                          END"""
+    )
+    db.take_stock_snapshot()
+    db.cursor.execute("UPDATE StockSnapshot SET taken_at = '2024-02-15 00:00:00.000'")
+    db.update_product_stock_level(1, -1)
+    db.cursor.execute(
+        """UPDATE StockMovement
+           SET moved_at = '2024-03-01 00:00:00.000'
+           WHERE moved_at > '2024-02-15'"""
+    )
+
+    assert db.view_stock_as_of("Product", 1, "2023-12-31 00:00:00") == 0
+    assert db.view_stock_as_of("Product", 1, "2024-01-15 00:00:00") == 3
+    assert db.view_stock_as_of("Product", 1, "2024-02-10 00:00:00") == 2
+    assert db.view_stock_as_of("Product", 1, "2024-03-10 00:00:00") == 1
+
+    # the movements before the snapshot aren't needed once it has been taken
+    db.cursor.execute("DELETE FROM StockMovement WHERE moved_at < '2024-02-15'")
+
+    assert db.view_stock_as_of("Product", 1, "2024-02-20 00:00:00") == 2
+    assert db.view_stock_as_of("Product", 1, "2024-03-10 00:00:00") == 1
+
+def test_view_stock_as_of_uses_latest_snapshot(db):
+    """
+    Tests that view_stock_as_of() starts from the snapshot with the latest movement,
+    even if the clock went backwards between the snapshots
+    """
+    db.insert_new_component("ComponentName", 10, 0)
+    db.take_stock_snapshot()
+    db.update_component_stock_level(1, -3)
+    db.take_stock_snapshot()
+    db.cursor.execute(
+        """UPDATE StockSnapshot
+           SET taken_at = CASE snapshot_id
+                              WHEN 1 THEN '2024-01-02 00:00:00.000'
+                              ELSE '2024-01-01 00:00:00.000'
+                          END"""
+    )
+    # the movements before the latest snapshot aren't needed once it has been taken
+    db.cursor.execute("DELETE FROM StockMovement")
+
+    assert db.view_stock_as_of("Component", 1, "2024-01-03 00:00:00") == 7
+
+def test_stock_snapshot_only_includes_moved_items(db):
+    """
+    Tests that a snapshot only records the items whose stock has changed since the
+    previous snapshot, and that view_stock_as_of() still works for the other items
+    """
+    db.insert_new_component("ComponentA", 10, 0)
+    db.insert_new_component("ComponentB", 20, 0)
+    db.take_stock_snapshot()
+    db.update_component_stock_level(2, -5)
+    db.take_stock_snapshot()
+
+    snapshots = db.execute_query_and_list_results(
+        "SELECT item_id, stock FROM StockSnapshot ORDER BY snapshot_id"
+    )
+
+    assert snapshots == [(1, 10), (2, 20), (2, 15)]
+    assert db.view_stock_as_of("Component", 1, "9999-12-31 00:00:00") == 10
+    assert db.view_stock_as_of("Component", 2, "9999-12-31 00:00:00") == 15
+
+def test_stock_history_kept_after_delete(db):
+    """
+    Tests that a deleted item's stock history is kept, and that an item which reuses
+    its ID doesn't inherit it
+    """
+    db.insert_new_component("ComponentA", 10, 0)
+    db.insert_new_component("ComponentB", 50, 0)
+    db.update_component_stock_level(2, -20)
+    db.take_stock_snapshot()
+    db.delete_component(2)
+    db.insert_new_component("ComponentC", 7, 0) # reuses ComponentB's ID
+
+    assert db.view_component_name_from_id(2) == ["ComponentC"]
+    assert db.view_sales_velocity(products=False)["data"][1] == (
+        "ComponentC", 7, 0, 0.0, 0.0, 0.0, None, "Component"
+    )
+
+    movements = db.execute_query_and_list_results(
+        """SELECT change, reason
+           FROM StockMovement
+           WHERE item_type = 'Component' AND item_id = 2
+           ORDER BY movement_id"""
+    )
+
+    assert movements == [
+        (50, "opening stock"), (-20, "adjustment"), (-30, "deleted"), (7, "opening stock")
+    ]
+
+    db.cursor.execute(
+        """UPDATE StockMovement
+           SET moved_at = CASE reason
+                              WHEN 'deleted' THEN '2024-02-01 00:00:00.000'
+                              ELSE '2024-01-01 00:00:00.000'
+                          END
+           WHERE item_id = 2 AND movement_id < (SELECT MAX(movement_id) FROM StockMovement)"""
+    )
+    db.cursor.execute("UPDATE StockSnapshot SET taken_at = '2024-01-01 00:00:00.000'")
+
+    assert db.view_stock_as_of("Component", 2, "2024-01-15 00:00:00") == 30
+    assert db.view_stock_as_of("Component", 2, "2024-03-01 00:00:00") == 0
+    assert db.view_stock_as_of("Component", 2, "9999-12-31 00:00:00") == 7
+
+def test_stock_snapshot_taken_automatically(db):
+    """Tests that a snapshot is taken after STOCK_SNAPSHOT_INTERVAL stock movements"""
+    db.STOCK_SNAPSHOT_INTERVAL = 3
+    db.insert_new_component("ComponentName", 10, 0) # the first movement
+    count_query = "SELECT COUNT(*) FROM StockSnapshot"
+
+    db.update_component_stock_level(1, -1)
+    assert db.execute_query_and_list_results(count_query)[0][0] == 0
+
+    db.update_component_stock_level(1, -1)
+    assert db.execute_query_and_list_results(count_query)[0][0] == 1
+    assert db.view_stock_as_of("Component", 1, "9999-12-31 00:00:00") == 8
+
 def test_delete_product(db):
     """Tests the delete_product() function"""
     product1_name = "Product1Name"
@@ -220,14 +940,181 @@ def test_validate_column_name_with_invalid_name(db, invalid_column_name):
     with pytest.raises(sqlite3.DataError): # this makes the test fail if an error is not raised
         db.validate_column_names([invalid_column_name])
 
+def test_schema_cache_refreshes_after_schema_change(db):
+    """
+    Tests that the cached table and column names are rebuilt when the schema changes
+    """
+    db.cursor.execute("CREATE TABLE NewTable (new_column INT)")
+
+    db.validate_table_name("NewTable")
+    db.validate_column_names(["new_column"])
+
+@pytest.mark.parametrize("batch_size", [1, 2, 10])
+def test_iter_query(db, batch_size):
+    """Tests that iter_query() yields every row, whatever the batch size"""
+    component_rows = [["Name1", 1, 0], ["Name2", 2, 1], ["Name3", 3, 2]]
+    db.insert_many("Component", component_rows)
+    query = "SELECT name, stock FROM Component ORDER BY component_id"
+
+    rows = list(db.iter_query(query, batch_size=batch_size))
+    names = list(db.iter_query(query, batch_size=batch_size, single_column_index=0))
+
+    assert rows == [("Name1", 1), ("Name2", 2), ("Name3", 3)]
+    assert names == ["Name1", "Name2", "Name3"]
+
+def test_iter_query_with_other_queries(db):
+    """Tests that other queries can be run while iterating over iter_query()"""
+    db.insert_many("Component", [["Name1", 1, 0], ["Name2", 2, 1]])
+    names = []
+
+    for component_id in db.iter_query("SELECT component_id FROM Component", batch_size=1):
+        names.extend(db.view_component_name_from_id(component_id[0]))
+
+    assert names == ["Name1", "Name2"]
+
+def test_read_connections_are_read_only(file_db):
+    """Tests that the connections used for queries can't change the database"""
+    with file_db._read_connection() as connection:
+        assert connection is not file_db.connection
+
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute("DELETE FROM Component")
+
+def test_queries_in_write_transaction_see_uncommitted_changes(file_db):
+    """
+    Tests that queries inside write_transaction() use the writer connection, and that
+    the read-only connections only see the changes once they are committed
+    """
+    with file_db.write_transaction() as cursor:
+        cursor.execute("INSERT INTO Component VALUES (NULL, 'NewComponent', 1, 0)")
+        assert file_db.view_component_names() == ["NewComponent"]
+
+    assert file_db.view_component_names() == ["NewComponent"]
+
+def test_iter_query_with_other_queries_uses_one_reader(file_db):
+    """
+    Tests that queries run while iterating over iter_query() reuse its read-only
+    connection, rather than waiting for another one
+    """
+    file_db.insert_many("Component", [["Name1", 1, 0], ["Name2", 2, 1], ["Name3", 3, 2]])
+    other_reader = file_db.readers.get() # leaves only one read-only connection
+    names = []
+
+    for component_id in file_db.iter_query("SELECT component_id FROM Component", batch_size=1):
+        names.extend(file_db.view_component_name_from_id(component_id[0]))
+
+    file_db.readers.put(other_reader)
+
+    assert names == ["Name1", "Name2", "Name3"]
+
+def test_iter_query_in_another_thread(file_db):
+    """
+    Tests that an iter_query() can't be read from a different thread, and that its
+    read-only connection is given back when it is closed by another thread
+    """
+    file_db.insert_many("Component", [["Name1", 1, 0], ["Name2", 2, 1], ["Name3", 3, 2]])
+    query = "SELECT name FROM Component ORDER BY component_id"
+    read_rows = file_db.iter_query(query, batch_size=1, single_column_index=0)
+    closed_rows = file_db.iter_query(query, batch_size=1, single_column_index=0)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert next(read_rows) == "Name1"
+        with pytest.raises(sqlite3.ProgrammingError):
+            executor.submit(lambda: list(read_rows)).result()
+
+        assert next(closed_rows) == "Name1"
+        executor.submit(closed_rows.close).result()
+
+    assert file_db.readers.qsize() == len(file_db.reader_connections)
+    assert file_db.view_component_names() == ["Name1", "Name2", "Name3"]
+
+def test_close_connection_with_unfinished_iter_query(file_db):
+    """
+    Tests that the database can't be closed while an iter_query() is still using a
+    read-only connection
+    """
+    file_db.insert_many("Component", [["Name1", 1, 0], ["Name2", 2, 1]])
+    rows = file_db.iter_query("SELECT name FROM Component", batch_size=1)
+    next(rows)
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        file_db.close_connection()
+
+    rows.close()
+
+def test_iter_query_in_memory_doesnt_block_writes(db):
+    """
+    Tests that an unfinished iter_query() on an in-memory database (which reads from
+    the writer connection) doesn't stop other threads from writing
+    """
+    db.insert_many("Component", [["Name1", 1, 0], ["Name2", 2, 1]])
+    rows = db.iter_query("SELECT name FROM Component", batch_size=1)
+    next(rows)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(db.update_component_stock_level, 1, 1).result(timeout=5)
+
+    rows.close()
+
+def test_concurrent_queries_and_writes(file_db):
+    """
+    Tests that queries and stock updates from several threads at once each get the
+    right results and column names
+    """
+    num_components = 20
+    file_db.insert_many(
+        "Component", [[f"Component{i}", 100, 0] for i in range(num_components)]
+    )
+
+    def query_or_update(task_num):
+        if task_num % 2 == 0:
+            file_db.update_component_stock_level(task_num // 2 % num_components + 1, -1)
+            return None
+
+        return file_db.view_filtered_components()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(query_or_update, range(400)))
+
+    for result in results:
+        if result is not None:
+            assert result["column_names"] == [
+                "component_id", "name", "stock", "low_stock_warning"
+            ]
+            assert len(result["data"]) == num_components
+
+    stock_levels = file_db.execute_query_and_list_results(
+        "SELECT stock FROM Component", single_column_index=0
+    )
+    assert stock_levels == [90] * num_components
+
 def test_get_all_table_names(db):
     """Test the _get_all_table_names() function"""
-    table_names = ["Design", "ProductType", "Product", "Component", "MadeUsing"]
+    table_names = [
+        "Design",
+        "ProductType",
+        "Product",
+        "Component",
+        "MadeUsing",
+        "StockMovement",
+        "StockSnapshot"
+    ]
     retrieved_table_names = db._get_all_table_names()
 
     assert len(table_names) == len(retrieved_table_names)
     assert set(table_names) == set(retrieved_table_names)
 
+def test_create_indexes(db):
+    """Tests that the create_indexes() function creates all the indexes"""
+    index_names = db.execute_query_and_list_results(
+        "SELECT name FROM sqlite_master WHERE type='index'", single_column_index=0
+    )
+
+    for index_name, _, _ in DatabaseManager.INDEXES:
+        assert index_name in index_names
+    for index_name, _ in DatabaseManager.LOW_STOCK_INDEXES:
+        assert index_name in index_names
+
 # ------------------------------------------     HELPER FUNCTIONS     ------------------------------------------
 
 def _setup_product_prerequisites(database):
@@ -301,3 +1188,25 @@ def _insert_new_product(product_name, database, product_prequisite_dict):
             )
         ]
     )
+
+def _insert_component_with_sales_history(db):
+    """
+    Inserts a component which had 14 used in the last day, 30 used 20 days ago, 90
+    used 60 days ago and 10 restocked, leaving 76 in stock, and a component which
+    hasn't been used. Returns the name of the first component.
+    """
+    db.insert_new_component("UsedComponent", 200, 0)
+    db.insert_new_component("UnusedComponent", 5, 0)
+
+    for change in (-14, -30, -90, 10):
+        db.update_component_stock_level(1, change)
+
+    for change, days_ago in ((-30, 20), (-90, 60)):
+        db.cursor.execute(
+            f"""UPDATE StockMovement
+                SET moved_at = strftime('%Y-%m-%d %H:%M:%f', 'now', '-{days_ago} days')
+                WHERE change = ?""",
+            (change,)
+        )
+
+    return "UsedComponent"